@@ -0,0 +1,262 @@
+"""
+Headless JSON API for report generation, for systems that need reports without the browser UI.
+
+Usage:
+    python api_server.py --port 8000 --workers 4
+
+Endpoints:
+    POST /reports                 {"company": "Nvidia", "regenerate": false, "deadline": 60}
+                                  -> 202 {"job_id", "status", ...}; identical in-flight requests share one job
+    GET  /reports/<job_id>        -> job status: queued, running, done or error
+    GET  /reports/<job_id>/result -> overview and use cases with resources (409 until done)
+    GET  /reports/<job_id>/pdf    -> the PDF report (409 until done)
+    GET  /health                  -> queue depth, workers, API rate-limit headroom and Gemini model health
+    GET  /metrics                 -> Prometheus metrics (see tracing)
+
+Set API_TOKEN to require an "Authorization: Bearer <token>" header on every request.
+"""
+import argparse
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import model_router
+import rate_limiter
+import tracing
+import utils
+from cache import normalize_query
+
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+API_TOKEN = os.getenv("API_TOKEN")
+# Submissions beyond this many waiting jobs are rejected with 503 instead of queueing forever
+MAX_QUEUED_JOBS = int(os.getenv("API_MAX_QUEUED_JOBS", "100"))
+# Finished jobs (and their PDFs) are kept this long for polling clients to collect
+JOB_TTL = float(os.getenv("API_JOB_TTL", "3600"))
+MAX_BODY_BYTES = 16 * 1024
+
+class Job:
+    def __init__(self, company, regenerate, deadline):
+        self.id = uuid.uuid4().hex
+        self.company = company
+        self.regenerate = regenerate
+        self.deadline = deadline
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.overview = None
+        self.use_cases = None
+        self.pdf_bytes = None
+        self.pdf_filename = None
+        self.requests = 1   # how many submissions this job is answering
+
+    def to_dict(self):
+        return {
+            "job_id": self.id, "company": self.company, "status": self.status,
+            "submitted": self.submitted, "started": self.started, "finished": self.finished,
+            "error": self.error, "requests": self.requests,
+        }
+
+class JobQueue:
+    """Runs report jobs on a bounded worker pool, sharing one job between identical in-flight requests."""
+
+    def __init__(self, workers=API_WORKERS, max_queued=MAX_QUEUED_JOBS, job_ttl=JOB_TTL):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._inflight = {}   # (normalized company, regenerate) -> job
+
+    def submit(self, company, regenerate=False, deadline=utils.DEFAULT_DEADLINE):
+        """Returns (job, created). Raises OverflowError when the queue is full."""
+        key = (normalize_query(company), regenerate)
+        with self._lock:
+            self._purge()
+            job = self._inflight.get(key)
+            if job is not None:
+                job.requests += 1
+                return job, False
+            if sum(1 for j in self._jobs.values() if j.status == "queued") >= self.max_queued:
+                raise OverflowError(f"{self.max_queued} jobs are already waiting")
+            job = Job(company, regenerate, deadline)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+        self._executor.submit(self._run, job, key)
+        return job, True
+
+    def _run(self, job, key):
+        job.status, job.started = "running", time.time()
+        try:
+            overview, use_cases, pdf_bytes, pdf_filename, error = utils.process_company_request(
+                job.company, deadline=job.deadline, use_store=not job.regenerate)
+        except Exception as e:
+            overview, use_cases, pdf_bytes, pdf_filename, error = None, None, None, None, f"Unexpected error: {e}"
+        job.overview, job.use_cases, job.pdf_bytes, job.pdf_filename = overview, use_cases, pdf_bytes, pdf_filename
+        job.error = error or (None if overview else "No report generated.")
+        job.finished = time.time()
+        with self._lock:
+            job.status = "error" if job.error else "done"
+            self._inflight.pop(key, None)
+        tracing.count("api_jobs_total", status=job.status)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", "done", "error")}
+
+    def _purge(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def _handler(queue):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_error(self, status, message):
+            self._send_json(status, {"error": message})
+
+        def _authorized(self):
+            if not API_TOKEN:
+                return True
+            supplied = self.headers.get('Authorization', '')
+            if hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {API_TOKEN}".encode('utf-8')):
+                return True
+            self._send_error(401, "Missing or wrong API token")
+            return False
+
+        def _job(self, job_id):
+            job = queue.get(job_id)
+            if job is None:
+                self._send_error(404, f"No job {job_id}")
+            return job
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            if self.path.split('?')[0].rstrip('/') != '/reports':
+                self._send_error(404, "Not found")
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_BYTES:
+                self._send_error(413, "Request body too large")
+                return
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+                company = str(body.get("company") or "").strip()
+                deadline = float(body["deadline"]) if body.get("deadline") else utils.DEFAULT_DEADLINE
+            except (ValueError, TypeError, AttributeError):
+                self._send_error(400, "Body must be JSON like {\"company\": \"Nvidia\"}")
+                return
+            if not company:
+                self._send_error(400, "\"company\" is required")
+                return
+            try:
+                job, created = queue.submit(company, bool(body.get("regenerate")), deadline)
+            except OverflowError as e:
+                self._send_error(503, f"Too many reports in progress: {e}")
+                return
+            self._send_json(202 if created else 200, job.to_dict())
+
+        def do_GET(self):
+            path = self.path.split('?')[0].rstrip('/')
+            if path == '/health':
+                self._send_json(200, {"workers": queue.workers, "jobs": queue.stats(), "apis": rate_limiter.stats(),
+                                      "gemini": model_router.stats()})
+                return
+            if not self._authorized():
+                return
+            if path == '/metrics':
+                data = tracing.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+
+            parts = path.split('/')[1:]
+            if len(parts) < 2 or parts[0] != 'reports' or len(parts) > 3:
+                self._send_error(404, "Not found")
+                return
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if len(parts) == 2:
+                self._send_json(200, job.to_dict())
+                return
+            if job.status == "error":
+                self._send_error(422, job.error)
+                return
+            if job.status != "done":
+                self._send_error(409, f"Job is {job.status}")
+                return
+            if parts[2] == 'result':
+                self._send_json(200, dict(job.to_dict(), overview=job.overview, use_cases=job.use_cases,
+                                          pdf_url=f"/reports/{job.id}/pdf"))
+            elif parts[2] == 'pdf':
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/pdf')
+                self.send_header('Content-Disposition', f'attachment; filename="{job.pdf_filename}"')
+                self.send_header('Content-Length', str(len(job.pdf_bytes)))
+                self.end_headers()
+                self.wfile.write(job.pdf_bytes)
+            else:
+                self._send_error(404, "Not found")
+
+        def log_message(self, format, *args):
+            print(f"{self.address_string()} {format % args}")
+
+    return Handler
+
+def build_server(host="0.0.0.0", port=API_PORT, workers=API_WORKERS):
+    """Creates (but doesn't start) the API server and its job queue."""
+    queue = JobQueue(workers=workers)
+    server = ThreadingHTTPServer((host, port), _handler(queue))
+    server.daemon_threads = True
+    server.queue = queue
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the report pipeline as a JSON API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Reports generated at once")
+    args = parser.parse_args(argv)
+
+    server = build_server(args.host, args.port, args.workers)
+    print(f"Report API listening on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.queue.shutdown()
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,7 @@
+import time
+
 import streamlit as st
+import tracing
 import utils
 
 st.set_page_config(layout="wide")
@@ -12,71 +15,122 @@ Enter a company name, and the agent will conduct research to generate a report c
 - Links to relevant datasets, GitHub repositories, and research papers.
 """)
 
+def render_use_case_text(case):
+    st.subheader(case["heading"])
+    st.write(case["description"])
+
+    st.markdown("**Implementation Steps:**")
+    for step in case["implementation_steps"]:
+        st.markdown(f"- {step}")
+
+def render_resources(case):
+    with st.expander("Explore Suggested Resources"):
+        st.markdown("##### **Top Datasets (from Kaggle)**")
+        if case["datasets"]:
+            for ds in case["datasets"]:
+                st.markdown(f"- [{ds['title']}]({ds['url']})")
+        else:
+            st.write("No relevant datasets found.")
+
+        st.markdown("---") # Visual separator
+        st.markdown("##### **Top Repositories (from GitHub)**")
+        if case["repos"]:
+            for repo in case["repos"]:
+                st.markdown(f"- [{repo['name']}]({repo['url']}) - ⭐ {repo['stars']}")
+        else:
+            st.write("No relevant repositories found.")
+
+        st.markdown("---")
+        st.markdown("##### **Top Research Papers (from ArXiv)**")
+        if case["papers"]:
+            for paper in case["papers"]:
+                st.markdown(f"- [{paper['title']}]({paper['url']})")
+        else:
+            st.write("No relevant research papers found.")
+
+def render_report_footer(report):
+    if report.get("stored_at"):
+        st.caption(f"Saved report from {time.strftime('%Y-%m-%d %H:%M', time.localtime(report['stored_at']))}. "
+                   "Tick \"Regenerate from scratch\" in the sidebar for a new one.")
+
+    # --- Provide the PDF Download Button at the end ---
+    # The PDF is only rendered once someone asks for it
+    pdf = report["pdf"]
+    if pdf.rendered or st.button("Prepare PDF"):
+        with st.spinner("Rendering PDF..."):
+            pdf_bytes = pdf.render()
+        st.download_button(
+            label="Download Full Report as PDF",
+            data=pdf_bytes,
+            file_name=report["pdf_filename"],
+            mime="application/pdf"
+        )
+
+    if show_timings:
+        st.sidebar.markdown("**Where the time went**")
+        st.sidebar.dataframe(tracing.breakdown(report["trace_id"]))
+
+def render_report(report):
+    """Redraws a finished report, e.g. after the rerun triggered by the download button."""
+    st.header("Company Overview")
+    st.write(report["overview"])
+    st.header("Top 5 AI/ML Use Cases")
+    for case in report["use_cases"]:
+        render_use_case_text(case)
+        render_resources(case)
+    render_report_footer(report)
+
 company_name = st.text_input("Enter the company name:", "Nvidia")
+show_timings = st.sidebar.checkbox("Show timing breakdown")
+regenerate = st.sidebar.checkbox("Regenerate from scratch", help="Ignore any saved report for this company")
 
 if st.button("Generate Report"):
     if company_name:
-        with st.spinner("Conducting research and building your report... This may take a moment."):
-            try:
-                # Unpack all the data returned from the main processing function
-                overview, use_cases, pdf_bytes, pdf_filename, error = utils.process_company_request(company_name)
-
-                if error:
-                    st.error(f"An error occurred: {error}")
-                
-                elif overview and use_cases:
-                    st.success("Report Generated Successfully!")
-
-                    # --- Display the full report in the Streamlit UI ---
-                    st.header("Company Overview")
-                    st.write(overview)
-
-                    st.header("Top 5 AI/ML Use Cases")
-                    for case in use_cases:
+        st.session_state.pop("report", None)
+        status = st.empty()
+        overview_area = st.container()
+        use_cases_area = st.container()
+        # Placeholders for each use case's resources, filled in once their lookups finish
+        resource_slots = {}
+        try:
+            # Render each section as soon as it arrives instead of waiting for the whole report
+            for kind, payload in utils.stream_company_request(company_name, use_store=not regenerate, defer_pdf=True):
+                if kind == "status":
+                    status.info(payload)
+
+                elif kind == "overview":
+                    with overview_area:
+                        st.header("Company Overview")
+                        st.write(payload)
+
+                elif kind == "use_case":
+                    index, case = payload
+                    with use_cases_area:
+                        if index == 0:
+                            st.header("Top 5 AI/ML Use Cases")
                         with st.container():
-                            st.subheader(case["heading"])
-                            st.write(case["description"])
-
-                            st.markdown("**Implementation Steps:**")
-                            for step in case["implementation_steps"]:
-                                st.markdown(f"- {step}")
-
-                            with st.expander("Explore Suggested Resources"):
-                                st.markdown("##### **Top Datasets (from Kaggle)**")
-                                if case["datasets"]:
-                                    for ds in case["datasets"]:
-                                        st.markdown(f"- [{ds['title']}]({ds['url']})")
-                                else:
-                                    st.write("No relevant datasets found.")
-
-                                st.markdown("---") # Visual separator
-                                st.markdown("##### **Top Repositories (from GitHub)**")
-                                if case["repos"]:
-                                    for repo in case["repos"]:
-                                        st.markdown(f"- [{repo['name']}]({repo['url']}) - ⭐ {repo['stars']}")
-                                else:
-                                    st.write("No relevant repositories found.")
-                                
-                                st.markdown("---")
-                                st.markdown("##### **Top Research Papers (from ArXiv)**")
-                                if case["papers"]:
-                                    for paper in case["papers"]:
-                                        st.markdown(f"- [{paper['title']}]({paper['url']})")
-                                else:
-                                    st.write("No relevant research papers found.")
-                    
-                    # --- Provide the PDF Download Button at the end ---
-                    st.download_button(
-                        label="Download Full Report as PDF",
-                        data=pdf_bytes,
-                        file_name=pdf_filename,
-                        mime="application/pdf"
-                    )
-                else:
-                    st.error("An unknown error occurred while generating the report.")
-
-            except Exception as e:
-                st.error(f"An unexpected application error occurred: {e}")
+                            render_use_case_text(case)
+                            resource_slots[index] = st.empty()
+                            resource_slots[index].caption("Looking up datasets, repositories and papers...")
+
+                elif kind == "resources":
+                    index, case = payload
+                    with resource_slots[index].container():
+                        render_resources(case)
+
+                elif kind == "done":
+                    status.success("Report Generated Successfully!")
+                    # Kept for this session, so reruns (like the download button's) don't lose the report
+                    st.session_state["report"] = payload
+                    render_report_footer(payload)
+
+                elif kind == "error":
+                    status.empty()
+                    st.error(f"An error occurred: {payload}")
+
+        except Exception as e:
+            st.error(f"An unexpected application error occurred: {e}")
     else:
         st.warning("Please enter a company name.")
-
+elif "report" in st.session_state:
+    render_report(st.session_state["report"])
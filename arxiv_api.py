@@ -1,33 +1,35 @@
 import requests
+import http_client
+from rate_limiter import RateLimited
+from cache import cached, cache_get, cache_set
+from keywords import query_key, query_keys, search_text, search_texts, tokenize
 import xml.etree.ElementTree as ET
 
+ATOM = '{http://www.w3.org/2005/Atom}'
+ARXIV_URL = "http://export.arxiv.org/api/query"
+# Upper bounds for the combined query so the URL and feed stay small
+BATCH_MAX_KEYWORDS = 40
+BATCH_MAX_RESULTS = 100
+
 def _extract_keywords(query_string):
-    """Extracts relevant keywords from a long query string for a lenient search."""
-    # Drastically reduced stop words for a more lenient search
-    stop_words = set(['a', 'an', 'the', 'in', 'on', 'for', 'with', 'of', 'and', 'to', 'from', 'using'])
-    
-    clean_query = ''.join(c for c in query_string if c.isalnum() or c.isspace()).lower()
-    words = clean_query.split()
-    # Lowered character limit to include more potential keywords
-    keywords = [word for word in words if word not in stop_words and len(word) > 1]
-    
-    # Using "OR" makes the search much more lenient, returning papers that match any keyword.
-    return ' OR '.join(list(dict.fromkeys(keywords)))
+    """The canonical keywords of a heading: its cache key, and the query sent to the offline index."""
+    return query_key(query_string, "papers")
 
+@cached("arxiv", key=_extract_keywords)
 def find_arxiv_papers(heading):
     """Searches ArXiv for papers based on extracted keywords."""
-    search_query = _extract_keywords(heading)
+    search_query = search_text(heading, "papers")
     # If for some reason the query is empty, search for a general term.
     if not search_query.strip():
         search_query = "machine learning"
         
     print(f"Searching ArXiv with lenient query: '{search_query}'")
 
-    url = "http://export.arxiv.org/api/query"
+    url = ARXIV_URL
     params = {'search_query': f'all:{search_query}', 'start': 0, 'max_results': 3}
     
     try:
-        response = requests.get(url, params=params)
+        response = http_client.get(url, params=params)
         response.raise_for_status()
         root = ET.fromstring(response.content)
         papers = []
@@ -36,7 +38,90 @@ def find_arxiv_papers(heading):
             url = entry.find('{http://www.w3.org/2005/Atom}id').text.strip()
             papers.append({'title': title, 'url': url})
         return papers
+    except RateLimited:
+        raise
     except (requests.exceptions.RequestException, ET.ParseError) as e:
         print(f"Error searching ArXiv: {e}")
         return []
 
+def _iter_feed_entries(stream):
+    """Streams an Atom feed, yielding (title, url, summary) per entry and freeing each one once read."""
+    for _, elem in ET.iterparse(stream, events=('end',)):
+        if elem.tag != ATOM + 'entry':
+            continue
+        title = ' '.join((elem.findtext(ATOM + 'title') or '').split())
+        url = (elem.findtext(ATOM + 'id') or '').strip()
+        summary = elem.findtext(ATOM + 'summary') or ''
+        elem.clear()
+        if title and url:
+            yield title, url, summary
+
+def _tokens(text):
+    # Normalized like the keywords, so "GPUs" in a title matches the keyword "gpu"
+    return set(tokenize(text))
+
+def _assign_papers(keyword_sets, entries, per_heading):
+    """
+    Scores every paper against every heading by keyword overlap and keeps the best `per_heading`.
+    Title matches count double, and words shared by many headings (e.g. the company name)
+    count less, so each heading gets the papers most specific to it.
+    """
+    heading_counts = {}
+    for keywords in keyword_sets:
+        for word in keywords:
+            heading_counts[word] = heading_counts.get(word, 0) + 1
+
+    scored_entries = [(_tokens(title), _tokens(summary), title, url) for title, url, summary in entries]
+    results = []
+    for keywords in keyword_sets:
+        scored = []
+        for rank, (title_tokens, summary_tokens, title, url) in enumerate(scored_entries):
+            score = sum((2 * (word in title_tokens) + (word in summary_tokens)) / heading_counts[word] for word in keywords)
+            if score > 0:
+                # ArXiv's own relevance order breaks ties
+                scored.append((-score, rank, {'title': title, 'url': url}))
+        scored.sort(key=lambda item: (item[0], item[1]))
+        results.append([paper for _, _, paper in scored[:per_heading]])
+    return results
+
+def find_arxiv_papers_batch(headings, per_heading=3):
+    """
+    Finds papers for several headings with a single ArXiv request.
+    Returns one list of {'title', 'url'} dicts per heading, in the same order as `headings`.
+    """
+    keys = query_keys(headings, "papers")
+    results = [None] * len(headings)
+    for i, key in enumerate(keys):
+        found, papers = cache_get("arxiv", key)
+        if found:
+            results[i] = papers
+    missing = [i for i, papers in enumerate(results) if papers is None]
+    if not missing:
+        return results
+
+    # Papers are scored against the normalized keywords, but searched for with the words as written
+    keyword_sets = [[word for word in keys[i].split(' OR ') if word] or ['machine', 'learning'] for i in missing]
+    texts = search_texts(headings, "papers")
+    search_words = [[word for word in texts[i].split(' OR ') if word] or ['machine', 'learning'] for i in missing]
+    combined = list(dict.fromkeys(word for words in search_words for word in words))[:BATCH_MAX_KEYWORDS]
+    search_query = ' OR '.join(f'all:{word}' for word in combined)
+    max_results = min(BATCH_MAX_RESULTS, per_heading * len(missing) * 4)
+    print(f"Searching ArXiv with one batched query for {len(missing)} headings")
+
+    params = {'search_query': search_query, 'start': 0, 'max_results': max_results}
+    try:
+        with http_client.get(ARXIV_URL, params=params, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            entries = list(_iter_feed_entries(response.raw))
+    except RateLimited:
+        raise
+    except (requests.exceptions.RequestException, ET.ParseError) as e:
+        print(f"Error searching ArXiv: {e}")
+        entries = []
+
+    for i, papers in zip(missing, _assign_papers(keyword_sets, entries, per_heading)):
+        results[i] = papers
+        if papers:
+            cache_set("arxiv", keys[i], papers)
+    return results
@@ -0,0 +1,219 @@
+"""
+Headless batch runner: generates reports for every company in a CSV or JSONL file.
+
+Usage:
+    python batch.py companies.csv --output-dir reports --workers 8
+
+Results are appended to <output-dir>/results.jsonl (one line per company) and PDFs are
+written to <output-dir>/pdfs/. Re-running the same command resumes where it left off:
+companies that already have a successful line in results.jsonl are skipped. Reports missing a
+source (rate limited or timed out) are recorded as "partial" and redone on the next run.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import rate_limiter
+import utils
+
+RESULTS_FILE = "results.jsonl"
+PDF_DIR = "pdfs"
+NAME_FIELDS = ("company", "company_name", "name")
+
+def normalize_company(name):
+    return ' '.join(name.lower().split())
+
+def _pick_name(record):
+    for field in NAME_FIELDS:
+        value = record.get(field)
+        if value and str(value).strip():
+            return str(value).strip()
+    return None
+
+def read_companies(path):
+    """Reads company names from a CSV (with a company/name column, or one name per row) or a JSONL file."""
+    names = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                name = record if isinstance(record, str) else _pick_name(record)
+                if name:
+                    names.append(name)
+        else:
+            rows = list(csv.reader(f))
+            header = [h.strip().lower() for h in rows[0]] if rows else []
+            column = next((header.index(field) for field in NAME_FIELDS if field in header), None)
+            if column is not None:
+                rows = rows[1:]
+            for row in rows:
+                if row and row[column or 0].strip():
+                    names.append(row[column or 0].strip())
+
+    # Drop duplicates but keep the input order
+    seen, unique = set(), []
+    for name in names:
+        key = normalize_company(name)
+        if key not in seen:
+            seen.add(key)
+            unique.append(name)
+    return unique
+
+def load_completed(results_path):
+    """Returns the normalized names of companies that already have a successful result."""
+    completed = set()
+    if not os.path.exists(results_path):
+        return completed
+    with open(results_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line; that company is simply redone.
+                continue
+            if record.get("status") == "ok":
+                completed.add(normalize_company(record["company"]))
+    return completed
+
+class ResultWriter:
+    """Appends result lines from many workers, flushing each one so a crash loses nothing finished."""
+
+    def __init__(self, path):
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+def process_one(company_name, pdf_dir, deadline=None, renderer=None):
+    """
+    Runs the report pipeline for one company and returns its result record.
+    With a `renderer` (BatchRenderer), PDFs are rendered on its worker processes straight to file.
+    """
+    started = time.time()
+    try:
+        overview, use_cases, pdf_bytes, pdf_filename, error = utils.process_company_request(
+            company_name, deadline=deadline, render_pdf=bool(pdf_dir) and renderer is None)
+    except Exception as e:
+        overview, use_cases, pdf_bytes, pdf_filename, error = None, None, None, None, f"Unexpected error: {e}"
+
+    record = {"company": company_name, "elapsed": round(time.time() - started, 2)}
+    if error or not overview:
+        record.update(status="error", error=error or "No report generated.")
+        return record
+
+    pdf_path = None
+    try:
+        if pdf_dir and pdf_bytes:
+            pdf_path = os.path.join(pdf_dir, pdf_filename)
+            # Write to a temp file first so a crash never leaves a half-written PDF behind
+            with open(pdf_path + ".tmp", 'wb') as f:
+                f.write(pdf_bytes)
+            os.replace(pdf_path + ".tmp", pdf_path)
+        elif pdf_dir and renderer is not None:
+            # Waiting here releases the GIL, so other companies' pipelines keep running meanwhile
+            pdf_path = renderer.render_to_file(os.path.join(pdf_dir, pdf_filename), company_name, overview, use_cases)
+    except Exception as e:
+        # Not "ok", so a resumed run tries this company again
+        record.update(status="error", error=f"Could not write the PDF: {e}")
+        return record
+
+    missing = sorted({key for case in use_cases for key in case.get("missing", [])})
+    if missing:
+        # Kept, but not "ok": a resumed run redoes it once the APIs answer again
+        record.update(status="partial", error=f"No results from {', '.join(missing)} (rate limited or timed out)",
+                      overview=overview, use_cases=use_cases, pdf=pdf_path)
+        return record
+    record.update(status="ok", overview=overview, use_cases=use_cases, pdf=pdf_path)
+    return record
+
+def run_batch(companies, output_dir, workers=4, write_pdfs=True, progress_every=10, deadline=utils.DEFAULT_DEADLINE,
+              pdf_workers=0):
+    """
+    Processes `companies` with a bounded worker pool, skipping ones already completed in `output_dir`.
+    With `pdf_workers`, PDFs are rendered by that many separate processes instead of the pipeline threads.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pdf_dir = os.path.join(output_dir, PDF_DIR) if write_pdfs else None
+    if pdf_dir:
+        os.makedirs(pdf_dir, exist_ok=True)
+
+    results_path = os.path.join(output_dir, RESULTS_FILE)
+    completed = load_completed(results_path)
+    pending = [name for name in companies if normalize_company(name) not in completed]
+    print(f"{len(companies)} companies, {len(companies) - len(pending)} already done, {len(pending)} to process.")
+    if not pending:
+        return {"processed": 0, "ok": 0, "partial": 0, "failed": 0}
+
+    writer = ResultWriter(results_path)
+    renderer = None
+    if pdf_dir and pdf_workers:
+        from pdf_generator import BatchRenderer
+        renderer = BatchRenderer(pdf_workers)
+    ok = partial = failed = 0
+    started = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(process_one, name, pdf_dir, deadline, renderer): name for name in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                record = future.result()
+                writer.write(record)
+                if record["status"] == "ok":
+                    ok += 1
+                elif record["status"] == "partial":
+                    partial += 1
+                    print(f"Partial: {record['company']}: {record['error']}")
+                else:
+                    failed += 1
+                    print(f"Failed: {record['company']}: {record['error']}")
+                if done % progress_every == 0 or done == len(pending):
+                    elapsed = time.time() - started
+                    rate = done / elapsed * 60 if elapsed else 0.0
+                    remaining = (len(pending) - done) / (done / elapsed) if elapsed else 0.0
+                    print(f"[{done}/{len(pending)}] ok={ok} partial={partial} failed={failed} "
+                          f"{rate:.1f} companies/min, ~{remaining / 60:.1f} min left ({rate_limiter.describe()})")
+    finally:
+        writer.close()
+        if renderer is not None:
+            renderer.close()
+    return {"processed": ok + partial + failed, "ok": ok, "partial": partial, "failed": failed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate AI/ML reports for many companies.")
+    parser.add_argument("input", help="CSV or JSONL file with company names")
+    parser.add_argument("--output-dir", default="reports", help="Directory for results.jsonl and PDFs")
+    parser.add_argument("--workers", type=int, default=4, help="Number of companies processed at once")
+    parser.add_argument("--no-pdf", action="store_true", help="Skip writing PDF files")
+    parser.add_argument("--deadline", type=float, default=utils.DEFAULT_DEADLINE,
+                        help="Per-company time budget in seconds (default: REPORT_DEADLINE_SECONDS or none)")
+    parser.add_argument("--progress-every", type=int, default=10, help="Print throughput every N companies")
+    parser.add_argument("--pdf-workers", type=int, default=0,
+                        help="Render PDFs in this many separate processes (default: in the pipeline threads)")
+    args = parser.parse_args(argv)
+
+    companies = read_companies(args.input)
+    summary = run_batch(companies, args.output_dir, workers=args.workers,
+                        write_pdfs=not args.no_pdf, progress_every=args.progress_every, deadline=args.deadline,
+                        pdf_workers=args.pdf_workers)
+    print(f"Finished: {summary['ok']} ok, {summary['partial']} partial, {summary['failed']} failed.")
+    if summary["partial"]:
+        print("Re-run the same command to retry the partial reports' missing sources.")
+    return 0 if summary["failed"] == 0 and summary["partial"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
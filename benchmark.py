@@ -0,0 +1,432 @@
+"""
+Replay-based benchmark for the full report pipeline.
+
+1. Record real responses once (needs the usual API keys):
+       python benchmark.py record Nvidia Stripe --fixtures bench_fixtures.json
+2. Replay them from a local stub server as often as you like, with no quota spend:
+       python benchmark.py replay --fixtures bench_fixtures.json --runs 5
+       python benchmark.py replay --concurrency 8 --runs 40          # throughput mode
+       python benchmark.py replay --latency generativelanguage.googleapis.com=4000:1000
+3. Measure cold-start import time (each run in a fresh interpreter):
+       python benchmark.py imports
+       python benchmark.py imports utils streamlit --runs 10
+
+Replay runs utils.process_company_request and pdf_generator.create_pdf against the stub and
+reports per-stage p50/p95 latency, total HTTP calls, bytes transferred and peak memory.
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+import http_client
+import model_router
+import rate_limiter
+
+DEFAULT_FIXTURES = "bench_fixtures.json"
+# Per-host (latency ms, jitter ms), roughly what we see in production. "*" covers scraped sites.
+DEFAULT_LATENCY = {
+    "www.googleapis.com": (250, 50),
+    "generativelanguage.googleapis.com": (2000, 500),
+    "api.github.com": (300, 100),
+    "export.arxiv.org": (500, 200),
+    "*": (400, 200),
+}
+# Query parameters that carry credentials and must never end up in a fixture file
+SECRET_PARAMS = {"key", "cx"}
+SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+STAGES = ["search", "scrape", "gemini", "resources", "pdf", "total"]
+# Entry points whose import time is the cold start of the app, the batch runner and the API
+IMPORT_TARGETS = ["utils", "batch", "api_server"]
+
+def fixture_key(method, host, path, query, body):
+    params = sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k not in SECRET_PARAMS)
+    digest = hashlib.sha1(body or b'').hexdigest()
+    return f"{method} {host}{path}?{urlencode(params)} {digest}"
+
+def _loose_key(method, host, path):
+    return f"{method} {host}{path}"
+
+# --- Recording ---
+
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests for real and keeps a decoded copy of every response."""
+
+    def __init__(self, entries, **kwargs):
+        super().__init__(**kwargs)
+        self.entries = entries
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        data = response.raw.read(decode_content=True)
+        parts = urlsplit(request.url)
+        body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS}
+        with self.lock:
+            self.entries.append({
+                "key": fixture_key(request.method, parts.netloc, parts.path, parts.query, body),
+                "loose_key": _loose_key(request.method, parts.netloc, parts.path),
+                "status": response.status_code,
+                "headers": headers,
+                "body": base64.b64encode(data).decode('ascii'),
+            })
+        # Hand back a fresh response over the bytes we just read, so streaming callers still work
+        replay = HTTPResponse(body=io.BytesIO(data), headers=headers, status=response.status_code,
+                              reason=response.reason, preload_content=False, decode_content=False)
+        return self.build_response(request, replay)
+
+def _mount(make_adapter):
+    """Mounts make_adapter(max_retries) on both shared sessions, keeping each one's retry policy."""
+    for retries in (True, False):
+        adapter = make_adapter(http_client._build_retry() if retries else 0)
+        session = http_client.get_session(retries)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+def record(companies, fixtures_path):
+    import utils
+    entries = []
+    _mount(lambda max_retries: RecordingAdapter(entries, max_retries=max_retries))
+    _disable_cache()
+    # Always the default model, so replays hit the same URLs (and no probe calls get recorded)
+    model_router.ENABLED = False
+
+    for company in companies:
+        print(f"Recording {company}...")
+        error = utils.process_company_request(company)[4]
+        if error:
+            print(f"  warning: {error}")
+
+    with open(fixtures_path, 'w', encoding='utf-8') as f:
+        json.dump({"companies": companies, "responses": entries}, f)
+    print(f"Recorded {len(entries)} responses to {fixtures_path}")
+
+# --- Replay ---
+
+class StubServer:
+    """Local HTTP server that answers from recorded fixtures, with per-host latency and jitter."""
+
+    def __init__(self, fixtures, latency):
+        self.exact = {}
+        self.loose = {}
+        for entry in fixtures["responses"]:
+            self.exact.setdefault(entry["key"], entry)
+            self.loose.setdefault(entry["loose_key"], entry)
+        self.latency = latency
+        self.calls = 0
+        self.misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def lookup(self, method, host, path, query, body):
+        entry = self.exact.get(fixture_key(method, host, path, query, body))
+        # Request bodies can drift slightly between runs (e.g. a different page order in the
+        # prompt); fall back to any recorded response for the same endpoint.
+        return entry or self.loose.get(_loose_key(method, host, path))
+
+    def delay(self, host):
+        latency, jitter = self.latency.get(host, self.latency.get("*", (0, 0)))
+        return max(0.0, latency + random.uniform(-jitter, jitter)) / 1000.0
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                # Paths look like /<scheme>/<host>/<original path>
+                _, _, host, rest = (self.path.split('/', 3) + [''])[:4]
+                path, _, query = ('/' + rest).partition('?')
+                entry = stub.lookup(self.command, host, path, query, body)
+                time.sleep(stub.delay(host))
+
+                status = entry["status"] if entry else 404
+                data = base64.b64decode(entry["body"]) if entry else b'no fixture recorded'
+                with stub.lock:
+                    stub.calls += 1
+                    stub.misses += entry is None
+                    stub.bytes_in += len(body)
+                    stub.bytes_out += len(data)
+                self.send_response(status)
+                for name, value in (entry["headers"] if entry else {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+class ReplayAdapter(HTTPAdapter):
+    """Rewrites every outgoing request to the stub server, keeping the original host in the path."""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = f"{self.base_url}/{parts.scheme}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+        return super().send(request, **kwargs)
+
+class StageTimer:
+    """Wraps the pipeline's stage functions in utils and records how long each call takes."""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.enabled = True
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        return timed
+
+    def install(self, utils):
+        utils.search_google = self.wrap("search", utils.search_google)
+        utils.scrape_pages = self.wrap("scrape", utils.scrape_pages)
+        utils.scrape_first_pages = self.wrap("scrape", utils.scrape_first_pages)
+        utils.generate_use_cases_with_gemini = self.wrap("gemini", utils.generate_use_cases_with_gemini)
+        utils.find_resources = self.wrap("resources", utils.find_resources)
+        utils.create_pdf = self.wrap("pdf", utils.create_pdf)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def _disable_cache():
+    import cache, report_store
+    cache.set_cache(None)
+    report_store.set_store(None)
+
+def _fill_credentials(utils):
+    # The finders skip themselves without credentials; the stub doesn't check them.
+    import github_api, kaggle_api
+    utils.GOOGLE_API_KEY = utils.GOOGLE_API_KEY or "replay"
+    utils.GOOGLE_CSE_ID = utils.GOOGLE_CSE_ID or "replay"
+    model_router.GEMINI_API_KEY = model_router.GEMINI_API_KEY or "replay"
+    kaggle_api.GOOGLE_API_KEY = kaggle_api.GOOGLE_API_KEY or "replay"
+    kaggle_api.GOOGLE_CSE_ID = kaggle_api.GOOGLE_CSE_ID or "replay"
+    github_api.GITHUB_API_KEY = github_api.GITHUB_API_KEY or "replay"
+
+def replay(fixtures_path, runs=3, concurrency=1, latency=None, deadline=None, use_cache=False, measure_memory=True,
+           rate_limits=False):
+    """Runs the pipeline against the stub and returns a results dict (also printed)."""
+    import utils
+    with open(fixtures_path, encoding='utf-8') as f:
+        fixtures = json.load(f)
+    companies = fixtures["companies"]
+    if not companies:
+        raise ValueError(f"{fixtures_path} has no recorded companies")
+
+    stub = StubServer(fixtures, DEFAULT_LATENCY if latency is None else latency).start()
+    _mount(lambda max_retries: ReplayAdapter(stub.base_url, max_retries=max_retries,
+                                             pool_maxsize=max(http_client.POOL_MAXSIZE, concurrency * 10)))
+    if not use_cache:
+        _disable_cache()
+    # The stub has no quotas; pacing requests would only measure the configured limits
+    rate_limiter.ENABLED = rate_limits
+    # Fixtures only cover the model that was recorded
+    model_router.ENABLED = False
+    _fill_credentials(utils)
+    timer = StageTimer()
+    timer.install(utils)
+
+    def run_one(i, timed=True):
+        company = companies[i % len(companies)]
+        started = time.perf_counter()
+        error = utils.process_company_request(company, deadline=deadline)[4]
+        if timed:
+            timer.add("total", time.perf_counter() - started)
+        return error
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        errors = [e for e in executor.map(run_one, range(runs)) if e]
+    wall = time.perf_counter() - started
+
+    peak_mb = None
+    if measure_memory:
+        # A separate traced run: tracemalloc slows Python down, so it stays out of the latency numbers
+        timer.enabled = False
+        tracemalloc.start()
+        run_one(0, timed=False)
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    stub.stop()
+
+    results = {
+        "runs": runs,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "wall_seconds": round(wall, 3),
+        "reports_per_second": round(runs / wall, 3) if wall else None,
+        "http_calls": stub.calls,
+        "fixture_misses": stub.misses,
+        "bytes_sent": stub.bytes_in,
+        "bytes_received": stub.bytes_out,
+        "peak_memory_mb": round(peak_mb, 2) if peak_mb is not None else None,
+        "stages": {
+            stage: {"p50_ms": round(percentile(samples, 50) * 1000, 1),
+                    "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                    "count": len(samples)}
+            for stage, samples in timer.samples.items() if samples
+        },
+    }
+    _print_results(results, errors)
+    return results
+
+def _print_results(results, errors):
+    print(f"\n{results['runs']} reports, concurrency {results['concurrency']}, "
+          f"{results['wall_seconds']}s wall, {results['reports_per_second']} reports/s")
+    print(f"{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'calls':>8}")
+    for stage, numbers in results["stages"].items():
+        print(f"{stage:<12}{numbers['p50_ms']:>10}{numbers['p95_ms']:>10}{numbers['count']:>8}")
+    print(f"HTTP calls: {results['http_calls']} ({results['fixture_misses']} without a fixture), "
+          f"sent {results['bytes_sent']} B, received {results['bytes_received']} B")
+    if results["peak_memory_mb"] is not None:
+        print(f"Peak traced memory: {results['peak_memory_mb']} MB")
+    for error in errors[:5]:
+        print(f"Error: {error}")
+
+def _import_times(module):
+    """
+    Imports `module` in a fresh interpreter with -X importtime. Returns (total µs, {direct import: cumulative µs})
+    for the modules first imported by `module` itself.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {result.stderr.strip().splitlines()[-1]}")
+    children = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        fields = line.partition("import time:")[2].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        cumulative, name = int(fields[1]), fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0 and name.strip() == module:
+            total = cumulative
+        elif depth == 1:
+            children[name.strip()] = cumulative
+    return total, children
+
+def measure_imports(modules=None, runs=5, top=8):
+    """Median cold import time per module over `runs` fresh interpreters, with its heaviest direct imports."""
+    results = {}
+    for module in modules or IMPORT_TARGETS:
+        totals, children = [], {}
+        for _ in range(runs):
+            total, direct = _import_times(module)
+            totals.append(total)
+            for name, cumulative in direct.items():
+                children.setdefault(name, []).append(cumulative)
+        heaviest = sorted(((name, percentile(samples, 50)) for name, samples in children.items()), key=lambda item: -item[1])
+        results[module] = {
+            "p50_ms": round(percentile(totals, 50) / 1000, 1),
+            "max_ms": round(max(totals) / 1000, 1),
+            "heaviest": {name: round(us / 1000, 1) for name, us in heaviest[:top]},
+        }
+        print(f"\n{module}: {results[module]['p50_ms']} ms p50, {results[module]['max_ms']} ms max over {runs} runs")
+        for name, ms in results[module]["heaviest"].items():
+            print(f"  {name:<32}{ms:>8} ms")
+    return results
+
+def _parse_latency(values, no_latency):
+    latency = {} if no_latency else dict(DEFAULT_LATENCY)
+    for value in values or []:
+        host, _, spec = value.partition('=')
+        ms, _, jitter = spec.partition(':')
+        latency[host] = (float(ms), float(jitter or 0))
+    return latency
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay benchmarks of the report pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rec = commands.add_parser("record", help="Run the pipeline live and save every response as a fixture")
+    rec.add_argument("companies", nargs="+")
+    rec.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+
+    rep = commands.add_parser("replay", help="Benchmark the pipeline against the recorded fixtures")
+    rep.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    rep.add_argument("--runs", type=int, default=3, help="Number of reports to generate")
+    rep.add_argument("--concurrency", type=int, default=1, help="Reports generated at once (throughput mode)")
+    rep.add_argument("--latency", action="append", metavar="HOST=MS[:JITTER]",
+                     help="Override the simulated latency for a host ('*' for scraped sites)")
+    rep.add_argument("--no-latency", action="store_true", help="Serve fixtures without simulated latency")
+    rep.add_argument("--deadline", type=float, default=None, help="Per-report deadline in seconds")
+    rep.add_argument("--with-cache", action="store_true", help="Keep the response cache and report store enabled")
+    rep.add_argument("--no-memory", action="store_true", help="Skip the peak-memory run")
+    rep.add_argument("--with-rate-limits", action="store_true", help="Pace API calls as in production")
+    rep.add_argument("--json", help="Also write the results to this file")
+
+    imp = commands.add_parser("imports", help="Measure cold-start import time of the entry points")
+    imp.add_argument("modules", nargs="*", help=f"Modules to import (default: {' '.join(IMPORT_TARGETS)})")
+    imp.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    imp.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.companies, args.fixtures)
+        return 0
+
+    if args.command == "imports":
+        results = measure_imports(args.modules, runs=args.runs)
+    else:
+        results = replay(args.fixtures, runs=args.runs, concurrency=args.concurrency,
+                         latency=_parse_latency(args.latency, args.no_latency), deadline=args.deadline,
+                         use_cache=args.with_cache, measure_memory=not args.no_memory,
+                         rate_limits=args.with_rate_limits)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
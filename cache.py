@@ -0,0 +1,171 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import tracing
+from config import connect_sqlite, optional_resource
+
+# Persistent response cache shared by the search/API modules.
+# Entries are keyed by source + normalized query, expire after a per-source TTL,
+# and the table is kept under CACHE_MAX_ENTRIES by evicting the least recently used rows.
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+DAY = 24 * 60 * 60
+DEFAULT_TTL = DAY
+SOURCE_TTLS = {
+    "google_search": 7 * DAY,
+    "kaggle": 7 * DAY,
+    "github": DAY,
+    "arxiv": 3 * DAY,
+    "gemini": 30 * DAY,
+    "gemini_models": DAY,
+    "page": 7 * DAY,
+}
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS responses ("
+    " source TEXT NOT NULL, query TEXT NOT NULL, value TEXT NOT NULL,"
+    " created REAL NOT NULL, accessed REAL NOT NULL,"
+    " PRIMARY KEY (source, query))",
+    "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)",
+)
+
+def normalize_query(query):
+    """Lower-cases and collapses whitespace so trivially different queries share an entry."""
+    return ' '.join(str(query).lower().split())
+
+class ResponseCache:
+    """SQLite-backed TTL + LRU cache. Values must be JSON serializable."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, ttls=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = dict(SOURCE_TTLS, **(ttls or {}))
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(self.path, SCHEMA)
+        return self._conn
+
+    def ttl(self, source):
+        return self.ttls.get(source, DEFAULT_TTL)
+
+    def get(self, source, query):
+        """Returns (found, value). Expired entries count as misses and are removed."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created FROM responses WHERE source = ? AND query = ?", (source, key)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl(source):
+                conn.execute("UPDATE responses SET accessed = ? WHERE source = ? AND query = ?", (now, source, key))
+                self.hits[source] = self.hits.get(source, 0) + 1
+                return True, json.loads(row[0])
+            if row:
+                conn.execute("DELETE FROM responses WHERE source = ? AND query = ?", (source, key))
+            self.misses[source] = self.misses.get(source, 0) + 1
+            return False, None
+
+    def set(self, source, query, value):
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (source, query, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (source, key, json.dumps(value), now, now),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self, source=None):
+        with self._lock:
+            conn = self._connection()
+            if source:
+                conn.execute("DELETE FROM responses WHERE source = ?", (source,))
+            else:
+                conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Hit/miss counters per source since the process started."""
+        with self._lock:
+            sources = set(self.hits) | set(self.misses)
+            return {s: {"hits": self.hits.get(s, 0), "misses": self.misses.get(s, 0)} for s in sorted(sources)}
+
+def _default_cache():
+    return ResponseCache()
+
+_cache = optional_resource(_default_cache, CACHE_ENABLED)
+
+def get_cache():
+    """Returns the process-wide cache, or None when caching is disabled."""
+    return _cache()
+
+def set_cache(cache):
+    """Swaps in a different cache backend (anything with get/set), or None to disable caching."""
+    _cache.set(cache)
+
+def cache_get(source, query):
+    """Looks up `query` in the shared cache. Returns (found, value); cache failures count as misses."""
+    cache = get_cache()
+    if cache is None:
+        return False, None
+    try:
+        found, value = cache.get(source, query)
+    except sqlite3.Error as e:
+        print(f"Cache read failed for {source}: {e}")
+        found, value = False, None
+    tracing.count("cache_requests_total", source=source, result="hit" if found else "miss")
+    tracing.tag(cache_hit=found)
+    return found, value
+
+def cache_set(source, query, value):
+    """Stores `value` in the shared cache; failures are logged and otherwise ignored."""
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(source, query, value)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        print(f"Cache write failed for {source}: {e}")
+
+def cached(source, key=None, should_cache=bool):
+    """
+    Decorator that caches a function's result under `source`.
+    `key` builds the query key from the call arguments (defaults to the joined positional args);
+    `should_cache` decides whether a result is worth storing (defaults to any non-empty result,
+    so failed lookups that return [] are retried next time).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if get_cache() is None:
+                return func(*args, **kwargs)
+            query = key(*args, **kwargs) if key else ' '.join(str(a) for a in args)
+            found, value = cache_get(source, query)
+            if found:
+                return value
+            result = func(*args, **kwargs)
+            if should_cache(result):
+                cache_set(source, query, result)
+            return result
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -1,57 +1,51 @@
-import os
-import requests
-import json
-from dotenv import load_dotenv
+import model_router
+from config import GEMINI_API_KEY
 
 # --- Instructions ---
 # 1. Make sure you have a .env file in the same directory as this script.
 # 2. Your .env file should contain your Gemini API key like this:
 #    GEMINI_API_KEY="AIzaSy..."
 # 3. Run this script from your terminal: python check_models.py
-# 4. Look for a model in the output that supports the "generateContent" method.
-# 5. Update the model name in your utils.py file with one from the list.
-#    For example, if you see 'models/gemini-pro', update the URL in utils.py.
+# 4. It lists the models your key can use, probes the ones reports may be routed to,
+#    and prints the order model_router would try them in right now.
+# 5. To change which models are used, set GEMINI_MODELS (comma-separated, most preferred
+#    first, or "*" for every model that supports generateContent); no code edits needed.
 
 def list_available_models():
     """
     Calls the Gemini API to list all available models and their supported methods.
     """
-    # Load the API key from the .env file
-    load_dotenv()
-    api_key = os.getenv("GEMINI_API_KEY")
-
-    if not api_key:
+    if not GEMINI_API_KEY:
         print("Error: GEMINI_API_KEY not found in .env file.")
         return
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-
     print("Fetching available models...")
-
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        
-        models_data = response.json()
-        
-        print("\n--- Available Gemini Models ---")
-        for model in models_data.get('models', []):
-            display_name = model.get('displayName', 'N/A')
-            model_name = model.get('name', 'N/A')
-            supported_methods = model.get('supportedGenerationMethods', [])
-            
-            print(f"\nModel Name: {model_name}")
-            print(f"  Display Name: {display_name}")
-            print(f"  Supported Methods: {', '.join(supported_methods)}")
-        
-        print("\n---------------------------------")
-        print("\nFind a model that supports 'generateContent' and update your utils.py file.")
-
-    except requests.exceptions.RequestException as e:
-        print(f"\nAn error occurred: {e}")
+    models, error = model_router.fetch_catalog()
+    if error:
+        print(f"\nAn error occurred: {error}")
         print("Please check your API key and network connection.")
-    except json.JSONDecodeError:
-        print("\nError: Could not decode the response from the API.")
+        return
+
+    print("\n--- Available Gemini Models ---")
+    for model in models:
+        print(f"\nModel Name: {model.get('name', 'N/A')}")
+        print(f"  Display Name: {model.get('displayName', 'N/A')}")
+        print(f"  Supported Methods: {', '.join(model.get('supportedGenerationMethods', []))}")
+    print("\n---------------------------------")
+
+def probe_models():
+    """Probes the models reports may use and shows their latency and the routing order."""
+    print("\nProbing models (GEMINI_MODELS)...")
+    latencies = model_router.probe_all()
+    stats = model_router.stats()
+    for name, latency in latencies.items():
+        if latency is None:
+            print(f"  {name}: failed ({stats['models'][name]['last_error']})")
+        else:
+            print(f"  {name}: {latency * 1000:.0f} ms")
+    print(f"\nReports will try: {' -> '.join(stats['order'])}")
 
 if __name__ == "__main__":
     list_available_models()
+    if GEMINI_API_KEY:
+        probe_models()
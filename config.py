@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+
+# Process-wide configuration, loaded once on first import. Secrets come from Streamlit's
+# secrets when running under `streamlit run`, otherwise (or when a secret isn't set there)
+# from the environment and the .env file.
+SECRET_NAMES = ("GEMINI_API_KEY", "GOOGLE_API_KEY", "GOOGLE_CSE_ID", "GITHUB_API_KEY")
+
+def running_streamlit():
+    """The streamlit module if this process is a running Streamlit app, else None. Never imports streamlit itself."""
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return None
+    try:
+        from streamlit import runtime
+    except ImportError:
+        return None
+    return st if runtime.exists() else None
+
+def _load_secrets():
+    from dotenv import load_dotenv
+    load_dotenv()
+    st = running_streamlit()
+    secrets = {}
+    for name in SECRET_NAMES:
+        value = None
+        if st is not None:
+            try:
+                value = st.secrets.get(name)
+            except Exception:
+                # No secrets.toml (the exception type differs between Streamlit versions)
+                value = None
+        secrets[name] = value or os.getenv(name)
+    return secrets
+
+_secrets = _load_secrets()
+GEMINI_API_KEY = _secrets["GEMINI_API_KEY"]
+GOOGLE_API_KEY = _secrets["GOOGLE_API_KEY"]
+GOOGLE_CSE_ID = _secrets["GOOGLE_CSE_ID"]
+GITHUB_API_KEY = _secrets["GITHUB_API_KEY"]
+
+def shared_resource(factory):
+    """
+    Turns a zero-argument factory into a getter for one shared instance per process (HTTP session,
+    caches...). Under Streamlit this is st.cache_resource, so the instance also survives the
+    module reloads Streamlit does when source files change.
+    """
+    st = running_streamlit()
+    if st is not None:
+        return st.cache_resource(show_spinner=False)(factory)
+
+    lock = threading.Lock()
+    instance = []
+
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    get.__name__ = getattr(factory, '__name__', 'get')
+    get.__doc__ = factory.__doc__
+    return get
+
+def optional_resource(factory, enabled=True):
+    """
+    A shared_resource getter that can be switched off (it then returns None) or pointed at another
+    instance with its `set(instance)`; set(None) switches it off. Used for the cache and report store.
+    """
+    default = shared_resource(factory)
+    state = {"enabled": enabled, "instance": None}
+
+    def get():
+        if not state["enabled"]:
+            return None
+        return state["instance"] if state["instance"] is not None else default()
+
+    def set(instance):
+        state["instance"] = instance
+        state["enabled"] = instance is not None
+    get.set = set
+    return get
+
+def connect_sqlite(path, schema=()):
+    """
+    Opens a SQLite database that many threads share through one connection (callers serialize access
+    with their own lock): autocommit, WAL so other processes can read while one writes, and the
+    `schema` statements run on open. The directory is created if needed.
+    """
+    import sqlite3
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for statement in schema:
+        conn.execute(statement)
+    return conn
@@ -0,0 +1,139 @@
+import hashlib
+import math
+import os
+import re
+import zlib
+from collections import Counter
+
+# Turns the scraped pages into the "Company Information" part of the Gemini prompt.
+# Corporate pages repeat a lot (cookie banners, navigation, the same product blurb on
+# every page), so the text is split into sentences, near-duplicates are dropped with
+# MinHash, and the most relevant sentences are packed into a token budget.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("GEMINI_CONTEXT_TOKEN_BUDGET", "2000"))
+CHARS_PER_TOKEN = 4          # close enough for English text with Gemini's tokenizer
+MAX_SENTENCE_CHARS = 400     # navigation/menu text has no punctuation; cut it into pieces
+MIN_WORDS = 3
+SHINGLE_SIZE = 3
+NUM_HASHES = 32
+BANDS = 8                    # NUM_HASHES / BANDS rows per band
+DUPLICATE_JACCARD = 0.6
+# Words that mark a sentence as being about the business rather than the website
+TOPIC_TERMS = frozenset("""
+    business model products product services service customers customer revenue platform
+    solutions solution industry market markets company founded headquartered operates
+    technology data software hardware enterprise consumers provides offers develops
+    manufactures sells mission segments
+""".split())
+# Words that mark website chrome (cookie banners, sign-in prompts, footers)
+BOILERPLATE_TERMS = frozenset("""
+    cookie cookies javascript browser login sign subscribe newsletter copyright reserved
+    privacy terms accept consent
+""".split())
+BOILERPLATE_PENALTY = 0.2
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])')
+_WORD = re.compile(r'[a-z0-9]+')
+_PRIME = (1 << 61) - 1
+
+def _coefficient(seed):
+    return int.from_bytes(hashlib.blake2b(seed.encode(), digest_size=8).digest(), 'big') % (_PRIME - 1) + 1
+
+# Fixed coefficients so the same pages always produce the same prompt (and Gemini cache key)
+_HASH_PARAMS = [(_coefficient(f"a{i}"), _coefficient(f"b{i}")) for i in range(NUM_HASHES)]
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def split_sentences(text):
+    """Splits text into sentences, cutting unpunctuated runs at MAX_SENTENCE_CHARS on a word boundary."""
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > MAX_SENTENCE_CHARS:
+            cut = sentence.rfind(' ', 0, MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+def _shingles(words):
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def _minhash(shingles):
+    values = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+    return [min((a * v + b) % _PRIME for v in values) for a, b in _HASH_PARAMS]
+
+def dedupe(sentences):
+    """
+    Returns the indexes of the sentences to keep: the first of every group of near-duplicates
+    (word 3-gram Jaccard similarity >= DUPLICATE_JACCARD). Candidates are found with MinHash
+    LSH banding and then confirmed on the exact shingle sets.
+    """
+    rows = NUM_HASHES // BANDS
+    buckets = {}
+    kept, kept_shingles = [], {}
+    for index, sentence in enumerate(sentences):
+        words = _WORD.findall(sentence.lower())
+        if len(words) < MIN_WORDS:
+            continue
+        shingles = _shingles(words)
+        signature = _minhash(shingles)
+        keys = [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+        candidates = {other for key in keys for other in buckets.get(key, ())}
+        if any(len(shingles & kept_shingles[other]) / len(shingles | kept_shingles[other]) >= DUPLICATE_JACCARD
+               for other in candidates):
+            continue
+        kept.append(index)
+        kept_shingles[index] = shingles
+        for key in keys:
+            buckets.setdefault(key, []).append(index)
+    return kept
+
+def rank(sentences, company_name):
+    """
+    Scores sentences by relevance to the company: idf-weighted overlap with the company's name
+    (counted triple) and TOPIC_TERMS, with a small bonus for appearing early on its page.
+    Sentences that look like website chrome are pushed to the bottom.
+    """
+    tokenized = [set(_WORD.findall(sentence.lower())) for sentence, _ in sentences]
+    document_frequency = Counter(word for words in tokenized for word in words)
+    total = len(sentences)
+    name_terms = set(_WORD.findall(company_name.lower()))
+
+    scores = []
+    for (sentence, position), words in zip(sentences, tokenized):
+        score = 0.0
+        for word in words & (name_terms | TOPIC_TERMS):
+            idf = math.log(1 + total / document_frequency[word])
+            score += idf * (3 if word in name_terms else 1)
+        # Longer sentences match more terms by chance; early sentences are usually the summary
+        score = score / math.sqrt(len(words)) + 0.5 / (1 + position)
+        if words & BOILERPLATE_TERMS:
+            score *= BOILERPLATE_PENALTY
+        scores.append(score)
+    return scores
+
+def prepare_context(pages, company_name, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Builds the prompt context from the scraped page texts: deduplicated, relevance-ranked
+    sentences that fit in `token_budget` tokens, kept in their original order.
+    """
+    sentences = []   # (sentence, position on its page)
+    for page in pages:
+        sentences.extend((sentence, position) for position, sentence in enumerate(split_sentences(page)))
+    kept = [sentences[i] for i in dedupe([sentence for sentence, _ in sentences])]
+    if not kept:
+        return ""
+
+    scores = rank(kept, company_name)
+    chosen, used = [], 0
+    for index in sorted(range(len(kept)), key=lambda i: -scores[i]):
+        cost = estimate_tokens(kept[index][0]) + 1
+        if used + cost <= token_budget:
+            chosen.append(index)
+            used += cost
+    return ' '.join(kept[index][0] for index in sorted(chosen))
@@ -0,0 +1,57 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import tracing
+
+# Share of the overall report deadline given to each stage, in pipeline order.
+# Time a stage doesn't use is passed on to the stages after it.
+STAGE_SHARES = [
+    ("search", 0.10),
+    ("scrape", 0.20),
+    ("gemini", 0.50),
+    ("resources", 0.15),
+    ("pdf", 0.05),
+]
+DEFAULT_DEADLINE = float(os.getenv("REPORT_DEADLINE_SECONDS", "0")) or None
+
+# Runs calls that must be abandoned when their budget runs out. The abandoned call keeps
+# running in the background until its own (budget-sized) socket timeout fires.
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="deadline")
+
+class Deadline:
+    """An end-to-end time budget for one report, split across the pipeline stages."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def budget(self, stage):
+        """Seconds available to `stage`: its share of whatever time is left for it and the later stages."""
+        names = [name for name, _ in STAGE_SHARES]
+        later = STAGE_SHARES[names.index(stage):]
+        share = later[0][1] / sum(s for _, s in later)
+        return self.remaining() * share
+
+def stage_timeout(deadline, stage, default):
+    """The timeout to use for `stage`: the caller's default, capped by the deadline's budget if there is one."""
+    if deadline is None:
+        return default
+    return min(default, deadline.budget(stage)) if default else deadline.budget(stage)
+
+def call_with_timeout(limit, func, *args, **kwargs):
+    """Runs `func` but gives up waiting after `limit` seconds (None waits forever). Raises TimeoutError."""
+    if limit is None:
+        return func(*args, **kwargs)
+    future = _executor.submit(tracing.propagate(func), *args, **kwargs)
+    try:
+        return future.result(timeout=max(limit, 0.0))
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"{getattr(func, '__name__', 'call')} did not finish within {limit:.1f}s")
@@ -0,0 +1,102 @@
+import json
+import re
+
+# Helpers for Gemini's streamGenerateContent endpoint: reading the SSE stream
+# and pulling the report's sections out of the JSON while it is still being written.
+
+_OVERVIEW_KEY = re.compile(r'"overview"\s*:\s*"')
+_USE_CASES_KEY = re.compile(r'"use_cases"\s*:\s*\[')
+_decoder = json.JSONDecoder()
+
+def iter_sse_text(response):
+    """Yields the text of every chunk in a `streamGenerateContent?alt=sse` response."""
+    # text/event-stream has no charset parameter, so requests would decode it as ISO-8859-1
+    response.encoding = 'utf-8'
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        data = json.loads(line[len('data:'):].strip())
+        for candidate in data.get('candidates', []):
+            for part in candidate.get('content', {}).get('parts', []):
+                if part.get('text'):
+                    yield part['text']
+
+def clean_json_text(text):
+    return text.strip().replace("```json", "").replace("```", "")
+
+class IncrementalReportParser:
+    """
+    Incremental parser for the report JSON ({"overview": ..., "use_cases": [...]}).
+    Feed it text as it streams in; it returns ("overview", str) and ("use_case", dict)
+    events as soon as each section is complete, without waiting for the whole document.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.overview = None
+        self.use_cases = []
+        self._pos = None        # scan position inside the use_cases array
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self._array_done = False
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+        if self.overview is None:
+            self._parse_overview(events)
+        if not self._array_done:
+            self._parse_use_cases(events)
+        return events
+
+    def _parse_overview(self, events):
+        match = _OVERVIEW_KEY.search(self.buffer)
+        if not match:
+            return
+        try:
+            value, _ = _decoder.raw_decode(self.buffer, match.end() - 1)
+        except json.JSONDecodeError:
+            return  # the string hasn't been closed yet
+        self.overview = value
+        events.append(("overview", value))
+
+    def _parse_use_cases(self, events):
+        if self._pos is None:
+            match = _USE_CASES_KEY.search(self.buffer)
+            if not match:
+                return
+            self._pos = match.end()
+
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    case = json.loads(buffer[self._object_start:self._pos + 1])
+                    self.use_cases.append(case)
+                    events.append(("use_case", case))
+            elif char == ']' and self._depth == 0:
+                self._array_done = True
+                self._pos += 1
+                return
+            self._pos += 1
+
+    def result(self):
+        """Parses the complete document once the stream has finished."""
+        return json.loads(clean_json_text(self.buffer))
@@ -1,51 +1,39 @@
 import os
 import requests
+import http_client
+from rate_limiter import RateLimited
+from cache import cached, cache_get, cache_set
+from keywords import query_key, query_keys, search_text, search_texts
+from config import GITHUB_API_KEY
 
-try:
-    import streamlit as st
-except ImportError:
-    st = None
-
-# Use secrets from Streamlit if available, otherwise use environment variables
-if st and hasattr(st, 'secrets'):
-    GITHUB_API_KEY = st.secrets.get("GITHUB_API_KEY")
-else:
-    from dotenv import load_dotenv
-    load_dotenv()
-    GITHUB_API_KEY = os.getenv("GITHUB_API_KEY")
+# Overridable so the search can be pointed at a local stub server
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL}/graphql")
 
 def _extract_keywords(query_string):
-    """Extracts relevant keywords from a long query string for a lenient search."""
-    # Drastically reduced stop words for a more lenient search
-    stop_words = set(['a', 'an', 'the', 'in', 'on', 'for', 'with', 'of', 'and', 'to', 'from', 'using'])
-    
-    clean_query = ''.join(c for c in query_string if c.isalnum() or c.isspace()).lower()
-    words = clean_query.split()
-    # Lowered character limit to include more potential keywords
-    keywords = [word for word in words if word not in stop_words and len(word) > 1]
-    
-    # Using " OR " (must be capitalized) makes the search much more lenient
-    return ' OR '.join(list(dict.fromkeys(keywords)))
+    """The canonical keywords of a heading: its cache key, and the query sent to the offline index."""
+    return query_key(query_string, "repos")
 
+@cached("github", key=_extract_keywords)
 def find_github_repos(heading):
     """Finds top GitHub repositories based on extracted keywords from the use case heading."""
     if not GITHUB_API_KEY:
         print("GitHub API key not found. Skipping GitHub search.")
         return []
 
-    search_query = _extract_keywords(heading)
+    search_query = search_text(heading, "repos")
     # If the query is empty after filtering, fall back to a general search term
     if not search_query.strip():
         search_query = "machine learning"
         
     print(f"Searching GitHub with lenient query: '{search_query}'")
     
-    url = "https://api.github.com/search/repositories"
+    url = f"{GITHUB_API_URL}/search/repositories"
     headers = {'Authorization': f'token {GITHUB_API_KEY}'}
     params = {'q': search_query, 'sort': 'stars', 'order': 'desc', 'per_page': 3}
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = http_client.get(url, headers=headers, params=params)
         response.raise_for_status()
         results = response.json().get('items', [])
         return [{
@@ -53,7 +41,90 @@ def find_github_repos(heading):
             'url': repo.get('html_url'),
             'stars': repo.get('stargazers_count', 0)
         } for repo in results]
+    except RateLimited:
+        raise
     except requests.exceptions.RequestException as e:
         print(f"Error searching GitHub: {e}")
         return []
 
+
+def _build_search_query(count, per_heading):
+    """Builds one GraphQL document with an aliased `search` field per heading."""
+    variables = ', '.join(f'$q{i}: String!' for i in range(count))
+    fields = '\n'.join(
+        f'  q{i}: search(query: $q{i}, type: REPOSITORY, first: {per_heading}) '
+        '{ nodes { ... on Repository { nameWithOwner url stargazerCount } } }'
+        for i in range(count)
+    )
+    return f'query({variables}) {{\n{fields}\n}}'
+
+def _search_graphql(search_queries, per_heading):
+    """Runs all searches in one GraphQL request. Returns a list of repo lists, or None if GraphQL failed."""
+    payload = {
+        'query': _build_search_query(len(search_queries), per_heading),
+        # `sort:stars` gives the same ordering as the REST call's sort=stars&order=desc
+        'variables': {f'q{i}': f'{query} sort:stars' for i, query in enumerate(search_queries)},
+    }
+    headers = {'Authorization': f'bearer {GITHUB_API_KEY}'}
+    try:
+        response = http_client.post(GITHUB_GRAPHQL_URL, json=payload, headers=headers)
+        response.raise_for_status()
+        data = response.json().get('data') or {}
+    except RateLimited:
+        raise
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"GitHub GraphQL search unavailable, falling back to REST: {e}")
+        return None
+
+    results = []
+    for i in range(len(search_queries)):
+        search = data.get(f'q{i}')
+        if search is None:
+            print("GitHub GraphQL search returned incomplete data, falling back to REST.")
+            return None
+        results.append([{
+            'name': repo.get('nameWithOwner'),
+            'url': repo.get('url'),
+            'stars': repo.get('stargazerCount', 0)
+        } for repo in search.get('nodes', []) if repo])
+    return results
+
+def find_github_repos_batch(headings, per_heading=3):
+    """
+    Finds repositories for several headings with a single GitHub GraphQL request.
+    Returns one list of name/url/stars dicts per heading, in the same order as `headings`,
+    or None when GraphQL is unavailable; the caller then falls back to find_github_repos.
+    """
+    if not GITHUB_API_KEY:
+        print("GitHub API key not found. Skipping GitHub search.")
+        return [[] for _ in headings]
+
+    keys = query_keys(headings, "repos")
+    results = [None] * len(headings)
+    for i, key in enumerate(keys):
+        found, repos = cache_get("github", key)
+        if found:
+            results[i] = repos
+    missing = [i for i, repos in enumerate(results) if repos is None]
+    if not missing:
+        return results
+
+    # Headings with the same keywords share one search, worded like the first of them
+    texts = search_texts(headings, "repos")
+    first_text = {}
+    for i in missing:
+        first_text.setdefault(keys[i], texts[i])
+    unique = list(first_text)
+    search_queries = [text if text.strip() else "machine learning" for text in first_text.values()]
+    print(f"Searching GitHub with one GraphQL query for {len(unique)} headings")
+    found_repos = _search_graphql(search_queries, per_heading)
+    if found_repos is None:
+        return None
+
+    by_key = dict(zip(unique, found_repos))
+    for key, repos in by_key.items():
+        if repos:
+            cache_set("github", key, repos)
+    for i in missing:
+        results[i] = by_key[keys[i]]
+    return results
@@ -0,0 +1,107 @@
+import os
+
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rate_limiter
+import tracing
+from config import shared_resource
+
+# Shared HTTP layer used by every module that talks to the network.
+# One pooled session means connections to api.github.com, googleapis.com etc.
+# are kept alive and reused across all the calls that make up a report.
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.5"))
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+# 429s are left to the rate limiter, which pauses the whole API instead of one request
+RETRY_STATUSES = (500, 502, 503, 504)
+# How many times a rate-limited request goes back into its API's queue before the 429 is returned
+RATE_LIMIT_REQUEUES = int(os.getenv("HTTP_RATE_LIMIT_REQUEUES", "3"))
+
+class _CountingRetry(Retry):
+    """Retry policy that also reports every retry attempt to the metrics."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        tracing.count("http_retries_total", host=getattr(_pool, "host", None),
+                      reason=response.status if response is not None else type(error).__name__)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+def _build_retry():
+    return _CountingRetry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        # A read timeout already cost a full READ_TIMEOUT, so only try once more.
+        read=min(1, MAX_RETRIES),
+        status=MAX_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD', 'POST']),
+        backoff_factor=BACKOFF_FACTOR,
+        backoff_jitter=BACKOFF_JITTER,
+        respect_retry_after_header=True,
+        # Hand the final response back to the caller so raise_for_status() reports it as before.
+        raise_on_status=False,
+    )
+
+def build_session(retries=True):
+    """
+    Creates a session with per-host connection pools, keep-alive and retry/backoff.
+    With `retries=False` the transport never retries, for callers that handle failures themselves.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                          max_retries=_build_retry() if retries else 0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_shared_session = shared_resource(build_session)
+
+@shared_resource
+def _no_retry_session():
+    return build_session(retries=False)
+
+def get_session(retries=True):
+    """Returns the process-wide shared session (or its no-retry twin), creating it on first use."""
+    return _shared_session() if retries else _no_retry_session()
+
+def request(method, url, timeout=None, requeue=True, retries=True, max_wait=None, **kwargs):
+    """
+    Sends a request through the shared session, applying the default connect/read timeouts.
+    Requests to rate-limited APIs wait for their turn first (see rate_limiter), for at most
+    `max_wait` seconds (default RATE_LIMIT_MAX_WAIT) before raising RateLimited. Without `requeue`,
+    a rate-limited response is returned straight away, and without `retries` timeouts and 5xx
+    aren't retried either (e.g. so model_router can try another Gemini model instead).
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    bucket = rate_limiter.for_url(url)
+    # Queueing is separate from the socket timeouts: at arXiv's pace a report's lookups alone
+    # can wait longer than one read timeout
+    if max_wait is None:
+        max_wait = rate_limiter.MAX_WAIT
+    with tracing.span("http", host=urlsplit(url).netloc, method=method) as span:
+        for attempt in range(RATE_LIMIT_REQUEUES + 1):
+            if bucket is not None:
+                bucket.acquire(max_wait)
+            response = get_session(retries).request(method, url, timeout=timeout, **kwargs)
+            if bucket is None or not bucket.observe(response) or not requeue or attempt == RATE_LIMIT_REQUEUES:
+                break
+            tracing.count("http_requeues_total", source=bucket.name)
+            response.close()
+        # Streamed bodies haven't been read yet, so fall back to the advertised length
+        size = len(response.content) if not kwargs.get('stream') else response.headers.get('Content-Length')
+        span.tag(status=response.status_code, bytes=int(size) if size else None, error=response.status_code >= 400 or None)
+        return response
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
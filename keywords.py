@@ -0,0 +1,117 @@
+import string
+from functools import lru_cache
+
+# Keyword extraction for the resource finders (Kaggle, GitHub, ArXiv) and the offline index.
+# A heading becomes a canonical query key: punctuation removed, lower-cased, stop words and
+# one-letter words dropped, plurals reduced to the singular, de-duplicated and sorted. So
+# "Nvidia GPU demand forecasting" and "demand forecasting for Nvidia GPUs" give the same key,
+# and share one cache entry and one API call. The key is only an identity: what is sent to
+# the search APIs is search_texts(), the heading's own words in their original order.
+BASE_STOP_WORDS = frozenset([
+    'a', 'an', 'the', 'in', 'on', 'for', 'with', 'of', 'and', 'to', 'from', 'using',
+])
+# Per source: (stop words, separator between keywords in the query)
+SOURCES = {
+    # Google search (for Kaggle) matches all words anyway, so filler words only narrow it
+    "datasets": (BASE_STOP_WORDS | {'about', 'recommendations', 'top', 'impactful'}, ' '),
+    # " OR " (must be capitalized) makes GitHub and ArXiv search much more lenient
+    "repos": (BASE_STOP_WORDS, ' OR '),
+    "papers": (BASE_STOP_WORDS, ' OR '),
+}
+MIN_WORD_LENGTH = 2
+# Words ending in "s" that aren't plurals (or whose singular would search worse)
+NOT_PLURAL = frozenset([
+    'news', 'series', 'species', 'aws', 'ios', 'macos', 'kubernetes', 'pandas', 'plus', 'thus', 'this', 'axis',
+    'iris', 'canvas', 'atlas', 'alias', 'bias', 'lens', 'chaos', 'ethos', 'kudos', 'always', 'perhaps', 'whereas',
+    'saas', 'paas', 'iaas', 'redis', 'postgres', 'does', 'yes',
+    'ops', 'mlops', 'devops', 'aiops', 'llmops', 'dataops', 'devsecops', 'secops', 'gitops', 'finops',
+])
+# "ies" is left alone too: "companies" -> "company" but "movies" -> "movy"
+NOT_PLURAL_ENDINGS = ('ss', 'ics', 'ies', 'ous')
+# Plurals in -ches/-shes drop "es" ("batches" -> "batch") unless the singular itself ends in "e"
+KEEPS_E = frozenset(['cache', 'niche', 'headache', 'avalanche', 'psyche'])
+# Checked by `python keywords.py`
+SINGULAR_EXAMPLES = [
+    ('gpus', 'gpu'), ('apis', 'api'), ('llms', 'llm'), ('kpis', 'kpi'), ('models', 'model'), ('ideas', 'idea'),
+    ('videos', 'video'), ('classes', 'class'), ('boxes', 'box'), ('batches', 'batch'), ('caches', 'cache'),
+    ('responses', 'response'), ('canvas', 'canvas'), ('atlas', 'atlas'), ('lens', 'lens'), ('bias', 'bias'),
+    ('status', 'status'), ('analysis', 'analysis'), ('analytics', 'analytics'), ('business', 'business'),
+    ('companies', 'companies'), ('news', 'news'), ('saas', 'saas'), ('mlops', 'mlops'), ('devops', 'devops'),
+]
+
+# Deletes ASCII punctuation and symbols in one C-level pass; \x00 survives as the separator
+# between the headings of a batch. Non-ASCII text also goes through _strip_unicode.
+_DELETE_PUNCTUATION = str.maketrans('', '', string.punctuation + ''.join(
+    chr(c) for c in range(1, 32) if not chr(c).isspace()) + '\x7f')
+_SEPARATOR = '\x00'
+
+def _strip_unicode(text):
+    return ''.join(c for c in text if c.isalnum() or c.isspace() or c == _SEPARATOR)
+
+@lru_cache(maxsize=8192)
+def singular(word):
+    """Reduces a simple English plural to its singular: "gpus" -> "gpu", "models" -> "model"."""
+    if len(word) <= 3 or not word.endswith('s') or word in NOT_PLURAL or word.endswith(NOT_PLURAL_ENDINGS):
+        return word
+    # "status", "corpus", "analysis", "basis"; but short acronym plurals like "gpus" and "apis" are plurals
+    if word.endswith(('us', 'is')) and len(word) > 4:
+        return word
+    if word.endswith(('ches', 'shes')) and word[:-1] not in KEEPS_E:
+        return word[:-2]
+    if word.endswith(('sses', 'xes')):
+        return word[:-2]
+    return word[:-1]
+
+def _clean(headings):
+    """Lower-cased, punctuation-free text of every heading, cleaned in one pass over the whole batch."""
+    if not headings:
+        return []
+    joined = _SEPARATOR.join(headings)
+    if joined.count(_SEPARATOR) != len(headings) - 1:
+        # A heading contains the separator itself
+        return _clean([heading.replace(_SEPARATOR, ' ') for heading in headings])
+    joined = joined.translate(_DELETE_PUNCTUATION)
+    if not joined.isascii():
+        joined = _strip_unicode(joined)
+    return joined.lower().split(_SEPARATOR)
+
+def tokenize(text):
+    """All words of `text` (stop words included), normalized like the query keys. Used for indexing."""
+    return [singular(word) for word in _clean([text])[0].split() if len(word) >= MIN_WORD_LENGTH]
+
+def extract_keywords(headings, source):
+    """
+    Extracts the keywords of many headings in one call: for each heading, the sorted set of its
+    normalized words without `source`'s stop words.
+    """
+    stop_words, _ = SOURCES[source]
+    return [sorted({singular(word) for word in text.split() if len(word) >= MIN_WORD_LENGTH and word not in stop_words})
+            for text in _clean(headings)]
+
+def query_keys(headings, source):
+    """The canonical query key of each heading for `source` ("datasets", "repos" or "papers")."""
+    _, separator = SOURCES[source]
+    return [separator.join(words) for words in extract_keywords(headings, source)]
+
+def query_key(heading, source):
+    return query_keys([heading], source)[0]
+
+def search_texts(headings, source):
+    """
+    The text to search `source` with for each heading: its keywords as written (not singularized)
+    in heading order, without stop words or repeats.
+    """
+    stop_words, separator = SOURCES[source]
+    return [separator.join(dict.fromkeys(word for word in text.split()
+                                         if len(word) >= MIN_WORD_LENGTH and word not in stop_words))
+            for text in _clean(headings)]
+
+def search_text(heading, source):
+    return search_texts([heading], source)[0]
+
+if __name__ == "__main__":
+    wrong = [(word, singular(word), expected) for word, expected in SINGULAR_EXAMPLES if singular(word) != expected]
+    for word, got, expected in wrong:
+        print(f"singular({word!r}) = {got!r}, expected {expected!r}")
+    print(f"{len(SINGULAR_EXAMPLES) - len(wrong)}/{len(SINGULAR_EXAMPLES)} singular() examples OK")
+    raise SystemExit(1 if wrong else 0)
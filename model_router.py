@@ -0,0 +1,258 @@
+"""
+Picks the Gemini model for each report.
+
+The models that may be used (GEMINI_MODELS, most preferred first, or "*" for every model in the
+catalog that supports generateContent) are checked against the cached /v1beta/models catalog and
+probed in the background with a tiny prompt every PROBE_INTERVAL seconds while reports are being
+generated. Reports go to the fastest healthy model; models within LATENCY_TOLERANCE of the fastest
+count as equally fast, and the preference order decides between them.
+
+A timeout, 429, 5xx or 404 from a model puts it in cooldown (for Retry-After when the API sends
+one) and the request moves on to the next model instead of stalling on the slow one. Reports are
+streamed, so the per-model read timeout limits the wait for each chunk, not the whole answer.
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+import rate_limiter
+import tracing
+from cache import cache_get, cache_set
+from config import GEMINI_API_KEY
+
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+MODEL_CANDIDATES = [name.strip() for name in
+                    os.getenv("GEMINI_MODELS", f"{DEFAULT_MODEL},gemini-2.0-flash,gemini-2.5-flash-lite").split(",")
+                    if name.strip()]
+ENABLED = os.getenv("GEMINI_ROUTING_ENABLED", "1") not in ("0", "false", "False")
+PROBE_INTERVAL = float(os.getenv("GEMINI_PROBE_INTERVAL", "900"))
+PROBE_TIMEOUT = float(os.getenv("GEMINI_PROBE_TIMEOUT", "15"))
+# Read timeout per model (the wait for each streamed chunk) while other models are left to fall
+# back to; the last one gets the rest
+ATTEMPT_TIMEOUT = float(os.getenv("GEMINI_ATTEMPT_TIMEOUT", "30"))
+MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+FAILURE_COOLDOWN = float(os.getenv("GEMINI_FAILURE_COOLDOWN", "60"))
+LATENCY_TOLERANCE = 1.5
+LATENCY_SMOOTHING = 0.3      # weight of the newest probe in the moving average
+FALLBACK_STATUSES = {404, 429, 500, 502, 503, 504}
+PROBE_PAYLOAD = {"contents": [{"parts": [{"text": "Reply with OK."}]}], "generationConfig": {"maxOutputTokens": 8}}
+
+_RETRY_DELAY = re.compile(r'^(\d+(?:\.\d+)?)s$')
+
+class ModelHealth:
+    def __init__(self, name):
+        self.name = name
+        self.latency = None          # moving average of probe latency, seconds
+        self.cooldown_until = 0.0
+        self.last_error = None
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.cooldown_until
+
+    def to_dict(self):
+        return {
+            "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "cooldown_for": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+            "successes": self.successes, "failures": self.failures, "last_error": self.last_error,
+        }
+
+_lock = threading.Lock()
+_health = {}
+_catalog = None             # model names supporting generateContent, once loaded
+_last_probe = None
+_probing = False
+
+def _model(name):
+    with _lock:
+        if name not in _health:
+            _health[name] = ModelHealth(name)
+        return _health[name]
+
+def model_url(model, method, **params):
+    query = ''.join(f"{key}={value}&" for key, value in params.items())
+    return f"{GEMINI_API_BASE}/models/{model}:{method}?{query}key={GEMINI_API_KEY}"
+
+def fetch_catalog():
+    """Lists every model the API key can use. Returns (models, error); models are dicts as the API sends them."""
+    models, page_token = [], None
+    try:
+        while True:
+            params = {'key': GEMINI_API_KEY, 'pageSize': 1000}
+            if page_token:
+                params['pageToken'] = page_token
+            response = http_client.get(f"{GEMINI_API_BASE}/models", params=params)
+            response.raise_for_status()
+            data = response.json()
+            models.extend(data.get('models', []))
+            page_token = data.get('nextPageToken')
+            if not page_token:
+                return models, None
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        return models, f"Could not list Gemini models: {e}"
+
+def catalog():
+    """Names of the models that support generateContent, from the response cache when possible. None if unavailable."""
+    global _catalog
+    if _catalog is not None:
+        return _catalog
+    found, names = cache_get("gemini_models", "generateContent")
+    if not found:
+        models, error = fetch_catalog()
+        if error:
+            print(error)
+            return None
+        names = [model['name'].rpartition('/')[2] for model in models
+                 if 'generateContent' in model.get('supportedGenerationMethods', [])]
+        cache_set("gemini_models", "generateContent", names)
+    _catalog = names
+    return _catalog
+
+def _configured():
+    """The models routing may use, most preferred first, limited to the catalog once it is known."""
+    available = _catalog
+    if MODEL_CANDIDATES == ["*"]:
+        return list(available or [DEFAULT_MODEL])
+    if available is None:
+        return list(MODEL_CANDIDATES)
+    return [name for name in MODEL_CANDIDATES if name in available] or [DEFAULT_MODEL]
+
+def probe(model):
+    """Sends the probe prompt to `model` and records how long it took. Returns the latency, or None on failure."""
+    started = time.monotonic()
+    try:
+        response = http_client.post(model_url(model, "generateContent"), json=PROBE_PAYLOAD,
+                                    timeout=(http_client.CONNECT_TIMEOUT, PROBE_TIMEOUT), requeue=False,
+                                    retries=False, max_wait=PROBE_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        report_failure(model, e)
+        return None
+    latency = time.monotonic() - started
+    health = _model(model)
+    with _lock:
+        health.latency = latency if health.latency is None else (
+            LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * health.latency)
+        health.cooldown_until = 0.0
+    tracing.gauge("gemini_probe_latency_seconds", round(latency, 3), model=model)
+    return latency
+
+def probe_all():
+    """Loads the catalog and probes every configured model in parallel. Returns {model: latency or None}."""
+    global _last_probe, _probing
+    try:
+        catalog()
+        models = _configured()
+        with ThreadPoolExecutor(max_workers=len(models), thread_name_prefix="gemini-probe") as executor:
+            return dict(zip(models, executor.map(probe, models)))
+    finally:
+        with _lock:
+            _last_probe, _probing = time.monotonic(), False
+
+def _maybe_probe():
+    global _probing
+    with _lock:
+        if _probing or (_last_probe is not None and time.monotonic() - _last_probe < PROBE_INTERVAL):
+            return
+        _probing = True
+    threading.Thread(target=probe_all, daemon=True, name="gemini-probe").start()
+
+def _order():
+    models = [_model(name) for name in _configured()]
+    preference = {health.name: index for index, health in enumerate(models)}
+    healthy = [health for health in models if health.healthy]
+    measured = [health.latency for health in healthy if health.latency is not None]
+    fastest = min(measured) if measured else None
+
+    def rank(health):
+        if health.latency is None:
+            return (1, preference[health.name])
+        if health.latency <= fastest * LATENCY_TOLERANCE:
+            return (0, preference[health.name])
+        return (2, health.latency)
+    # Models in cooldown stay at the back as a last resort, the soonest to recover first
+    cooling = sorted((health for health in models if not health.healthy), key=lambda health: health.cooldown_until)
+    return [health.name for health in sorted(healthy, key=rank) + cooling]
+
+def candidates():
+    """The models to try for the next request, best first (see the module docstring)."""
+    if not ENABLED:
+        return [DEFAULT_MODEL]
+    _maybe_probe()
+    return _order()
+
+def attempts(timeout):
+    """
+    Yields (model, read timeout) for each model to try within `timeout` seconds in total. Every
+    attempt but the last is capped at ATTEMPT_TIMEOUT so a stalled model leaves time for the next.
+    """
+    models = candidates()[:MAX_ATTEMPTS]
+    give_up = time.monotonic() + timeout
+    for index, model in enumerate(models):
+        remaining = give_up - time.monotonic()
+        if remaining <= 0:
+            return
+        if index > 0:
+            tracing.count("gemini_fallbacks_total", model=model)
+        yield model, remaining if index == len(models) - 1 else min(ATTEMPT_TIMEOUT, remaining)
+
+def _cooldown(error):
+    response = getattr(error, 'response', None)
+    if response is None or response.status_code != 429:
+        return FAILURE_COOLDOWN
+    retry_after = response.headers.get('Retry-After')
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    # Gemini puts the delay in the error body: {"error": {"details": [{"retryDelay": "37s"}]}}
+    try:
+        for detail in response.json()['error'].get('details', []):
+            match = _RETRY_DELAY.match(str(detail.get('retryDelay', '')))
+            if match:
+                return float(match.group(1))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return FAILURE_COOLDOWN
+
+def report_success(model):
+    health = _model(model)
+    with _lock:
+        health.successes += 1
+        health.cooldown_until = 0.0
+
+def report_failure(model, error, timeout=None):
+    """
+    Records a failed request to `model`. Returns True if the error is the model's fault (timeout,
+    429, 5xx, unknown model) and the request should fall back to the next model.
+    A read timeout shorter than ATTEMPT_TIMEOUT (the report's budget was nearly spent) still
+    falls back, but doesn't put the model in cooldown.
+    """
+    response = getattr(error, 'response', None)
+    status = response.status_code if response is not None else None
+    # Waiting too long in our own rate limiter's queue counts as being throttled too
+    fall_back = status in FALLBACK_STATUSES if status is not None else isinstance(
+        error, (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                rate_limiter.RateLimited))
+    health = _model(model)
+    with _lock:
+        health.failures += 1
+        health.last_error = f"{status}" if status else type(error).__name__
+        cut_short = isinstance(error, requests.ReadTimeout) and timeout is not None and timeout < ATTEMPT_TIMEOUT
+        if fall_back and not cut_short:
+            health.cooldown_until = time.monotonic() + _cooldown(error)
+    tracing.count("gemini_model_errors_total", model=model, reason=health.last_error)
+    return fall_back
+
+def stats():
+    """Health of every model seen so far, keyed by name, plus the current routing order."""
+    with _lock:
+        models = {name: health.to_dict() for name, health in _health.items()}
+    return {"order": _order() if ENABLED else [DEFAULT_MODEL], "models": models}
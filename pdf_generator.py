@@ -1,6 +1,11 @@
-from fpdf import FPDF
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from fpdf import FPDF
+
 # A custom PDF class to handle headers and footers
 class PDF(FPDF):
     def header(self):
@@ -13,16 +18,27 @@ class PDF(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
+def _fits_one_line(pdf, text):
+    if '\n' in text:
+        return False
+    # Same measure multi_cell uses, summed in one pass over the font's width table
+    width = sum(map(pdf.current_font['cw'].__getitem__, text)) * pdf.font_size / 1000.0
+    return width <= pdf.w - pdf.r_margin - pdf.x - 2 * pdf.c_margin
+
 # Helper function to write text with proper encoding and line breaks
 def write_text(pdf, text, size=11, style=''):
     pdf.set_font("Arial", style, size)
-    # Encode to latin-1, replacing unsupported characters
-    clean_text = text.encode('latin-1', 'replace').decode('latin-1')
-    pdf.multi_cell(0, 5, clean_text)
+    # Encode to latin-1, replacing unsupported characters (plain ASCII needs no work)
+    clean_text = text if text.isascii() else text.encode('latin-1', 'replace').decode('latin-1')
+    if _fits_one_line(pdf, clean_text):
+        # Fast path for short lines (most resource links): a single cell is laid out exactly like
+        # a one-line multi_cell, without its character-by-character line breaking
+        pdf.cell(0, 5, clean_text, 0, 1)
+    else:
+        pdf.multi_cell(0, 5, clean_text)
     pdf.ln(3)
 
-def create_pdf(company_name, overview, use_cases):
-    """Generates a professionally formatted PDF report in memory."""
+def _render(company_name, overview, use_cases):
     pdf = PDF()
     pdf.add_page()
     
@@ -55,14 +71,14 @@ def create_pdf(company_name, overview, use_cases):
         
         # Implementation Steps
         pdf.set_font("Arial", 'B', 12)
-        pdf.multi_cell(0, 5, "Implementation Steps:")
+        pdf.cell(0, 5, "Implementation Steps:", 0, 1)
         for step in case.get('implementation_steps', []):
              # Replaced the special bullet character with a standard hyphen
              write_text(pdf, f"  -  {step.replace('**', '')}")
         
         # Resources
         pdf.set_font("Arial", 'B', 12)
-        pdf.multi_cell(0, 5, "Suggested Resources:")
+        pdf.cell(0, 5, "Suggested Resources:", 0, 1)
         
         # Datasets
         pdf.set_text_color(0, 0, 139) # Dark Blue for links
@@ -86,6 +102,69 @@ def create_pdf(company_name, overview, use_cases):
         pdf.set_text_color(0, 0, 0) # Reset text color
         pdf.ln(10)
 
+    return pdf
+
+def create_pdf(company_name, overview, use_cases):
+    """Generates a professionally formatted PDF report in memory."""
     # Return PDF content as bytes
-    return pdf.output(dest='S').encode('latin-1')
+    return _render(company_name, overview, use_cases).output(dest='S').encode('latin-1')
+
+def render_to_file(path, company_name, overview, use_cases):
+    """Renders the report straight to `path` (via a temp file, so a crash never leaves half a PDF). Returns `path`."""
+    _render(company_name, overview, use_cases).output(path + ".tmp", 'F')
+    os.replace(path + ".tmp", path)
+    return path
+
+class DeferredPDF:
+    """
+    A report PDF that is only rendered the first time its bytes are asked for, e.g. when the
+    user actually clicks download. `on_render` is called once with the bytes (to store them).
+    """
+
+    def __init__(self, company_name, overview, use_cases, pdf_bytes=None, on_render=None):
+        self.company_name = company_name
+        self.overview = overview
+        self.use_cases = use_cases
+        self._bytes = pdf_bytes
+        self._on_render = on_render
+        self._lock = threading.Lock()
+
+    @property
+    def rendered(self):
+        return self._bytes is not None
+
+    def render(self):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = create_pdf(self.company_name, self.overview, self.use_cases)
+                if self._on_render:
+                    self._on_render(self._bytes)
+            return self._bytes
+
+class BatchRenderer:
+    """
+    Renders many reports to files on a pool of worker processes. Each worker imports fpdf
+    and loads the font metrics once and then renders report after report, and the CPU work
+    stays off the calling process' GIL, so pipeline threads keep fetching meanwhile.
+    """
+
+    def __init__(self, workers=None):
+        # spawn, not fork: the caller is usually full of threads
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, path, company_name, overview, use_cases):
+        """Starts rendering one report to `path`; returns a future for the path."""
+        return self._executor.submit(render_to_file, path, company_name, overview, use_cases)
+
+    def render_to_file(self, path, company_name, overview, use_cases):
+        return self.submit(path, company_name, overview, use_cases).result()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
@@ -0,0 +1,207 @@
+"""
+Per-API request scheduling.
+
+Every call to a rate-limited API takes a slot from that API's token bucket first, so bursts
+from many reports are queued and spread out at a pace the API accepts instead of being
+answered with 429s. Buckets also follow the quota the API reports back:
+  - X-RateLimit-Remaining / X-RateLimit-Reset (GitHub) slow the bucket down so the remaining
+    quota lasts until the reset, and pause it once the quota is used up,
+  - a 429 (or GitHub's 403 with no remaining quota) pauses the bucket for Retry-After, and
+    http_client re-queues the request instead of failing it.
+
+Limits can be overridden per API with RATE_LIMIT_<NAME>=<requests per second>[:<burst>],
+e.g. RATE_LIMIT_ARXIV=0.5:2, and switched off entirely with RATE_LIMITS_ENABLED=0.
+"""
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+import tracing
+
+ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") not in ("0", "false", "False")
+# Longest a request may sit in the queue before giving up with RateLimited
+MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "120"))
+# Pause after a 429 that doesn't say how long to wait
+DEFAULT_PAUSE = float(os.getenv("RATE_LIMIT_DEFAULT_PAUSE", "10"))
+
+# (name, host, path prefix, requests per second, burst)
+API_LIMITS = [
+    # Shared by search_google and find_kaggle_datasets (100 queries/minute per project)
+    ("google_cse", "www.googleapis.com", "/customsearch", 1.5, 5),
+    # Authenticated REST search allows 30 requests/minute
+    ("github_search", "api.github.com", "/search", 0.5, 5),
+    ("github_graphql", "api.github.com", "/graphql", 1.0, 5),
+    # arXiv asks clients to make no more than one request every three seconds
+    ("arxiv", "export.arxiv.org", "/api", 1 / 3, 1),
+    ("gemini", "generativelanguage.googleapis.com", "/", 1.0, 5),
+]
+# APIs whose quota applies per model (/models/<model>:<method>): each model gets its own bucket
+# with the API's limits, so one throttled model doesn't hold up the others
+PER_MODEL_APIS = {"gemini"}
+
+class RateLimited(requests.exceptions.RequestException):
+    """Raised when a request would have to wait in the queue longer than allowed."""
+
+class TokenBucket:
+    """
+    A token bucket kept as a "theoretical arrival time" (GCRA): each request reserves the next
+    free slot and sleeps until it, so waiting requests are served in order at a steady pace.
+    """
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._next = 0.0            # when the bucket would be empty again at the current pace
+        self._paused_until = 0.0
+        self._quota_interval = 0.0  # extra spacing needed to make the reported quota last
+        self.waiting = 0
+        self.remaining = None       # last quota the API reported, if it reports one
+        self.reset_at = None        # time.time() when that quota resets
+
+    def _interval(self, now):
+        if self.reset_at is not None and time.time() >= self.reset_at:
+            self._quota_interval = 0.0
+        return max(1.0 / self.rate, self._quota_interval)
+
+    def acquire(self, max_wait=MAX_WAIT):
+        """Blocks until the request may be sent. Raises RateLimited if that is more than `max_wait` away."""
+        give_up = time.monotonic() + max_wait
+        with self._lock:
+            self.waiting += 1
+            tracing.gauge("rate_limit_queue_depth", self.waiting, source=self.name)
+        try:
+            while True:
+                wait = self._reserve(give_up)
+                if wait > 0:
+                    with tracing.span("rate_limit", source=self.name):
+                        time.sleep(wait)
+                # A 429 seen while this request slept pauses it too; it then queues again
+                if time.monotonic() >= self._paused_until:
+                    return
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                tracing.gauge("rate_limit_queue_depth", self.waiting, source=self.name)
+
+    def _reserve(self, give_up):
+        with self._lock:
+            now = time.monotonic()
+            interval = self._interval(now)
+            start = max(self._next, now, self._paused_until)
+            send_at = max(start - (self.burst - 1) * interval, now, self._paused_until)
+            if send_at > give_up:
+                raise RateLimited(f"{self.name} rate limit: next slot in {send_at - now:.0f}s")
+            self._next = start + interval
+            return send_at - now
+
+    def pause(self, seconds):
+        """Holds every queued and future request for `seconds`, then resumes at the normal pace."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                # Don't let the whole burst through the moment the pause ends
+                self._next = max(self._next, until + (self.burst - 1) * self._interval(until))
+        tracing.count("rate_limit_pauses_total", source=self.name)
+
+    def observe(self, response):
+        """Updates the bucket from a response's quota headers. Returns True if it was rate limited."""
+        headers = response.headers
+        remaining, reset = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Reset")
+        if remaining is not None and remaining.isdigit():
+            self.remaining = int(remaining)
+            self.reset_at = float(reset) if reset and reset.isdigit() else None
+            tracing.gauge("rate_limit_quota_remaining", self.remaining, source=self.name)
+            window = self.reset_at - time.time() if self.reset_at else 0
+            with self._lock:
+                # Spread what's left of the quota evenly over the rest of its window
+                self._quota_interval = window / self.remaining if self.remaining and window > 0 else 0.0
+
+        limited = response.status_code == 429 or (response.status_code == 403 and self.remaining == 0)
+        if limited:
+            self.pause(_retry_after(headers) or (self.reset_at - time.time() if self.reset_at else DEFAULT_PAUSE))
+        elif self.remaining == 0 and self.reset_at:
+            self.pause(self.reset_at - time.time())
+        return limited
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            interval = self._interval(now)
+            tokens = self.burst - max(0.0, self._next - now) / interval
+            return {
+                "queued": self.waiting,
+                "tokens": round(max(0.0, tokens), 2),
+                "rate_per_second": round(1.0 / interval, 3),
+                "paused_for": round(max(0.0, self._paused_until - now), 1),
+                "quota_remaining": self.remaining,
+                "quota_resets_in": round(self.reset_at - time.time(), 1) if self.reset_at else None,
+            }
+
+def _retry_after(headers):
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _load_limits():
+    buckets = []
+    for name, host, prefix, rate, burst in API_LIMITS:
+        override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+        if override:
+            rate_text, _, burst_text = override.partition(":")
+            rate, burst = float(rate_text), int(burst_text or burst)
+        buckets.append((host, prefix, TokenBucket(name, rate, burst)))
+    return buckets
+
+_buckets = _load_limits()
+_model_buckets = {}
+_model_buckets_lock = threading.Lock()
+
+def _model_bucket(bucket, path):
+    model = path.partition('/models/')[2].partition(':')[0]
+    if not model:
+        return bucket
+    name = f"{bucket.name}:{model}"
+    with _model_buckets_lock:
+        if name not in _model_buckets:
+            _model_buckets[name] = TokenBucket(name, bucket.rate, bucket.burst)
+        return _model_buckets[name]
+
+def for_url(url):
+    """The bucket that governs requests to `url`, or None for hosts without a limit (e.g. scraped pages)."""
+    if not ENABLED:
+        return None
+    parts = urlsplit(url)
+    for host, prefix, bucket in _buckets:
+        if parts.netloc == host and parts.path.startswith(prefix):
+            return _model_bucket(bucket, parts.path) if bucket.name in PER_MODEL_APIS else bucket
+    return None
+
+def get_bucket(name):
+    return next(bucket for _, _, bucket in _buckets if bucket.name == name)
+
+def stats():
+    """Queue depth and quota headroom of every API, keyed by name."""
+    with _model_buckets_lock:
+        buckets = [bucket for _, _, bucket in _buckets] + list(_model_buckets.values())
+    return {bucket.name: bucket.stats() for bucket in buckets}
+
+def describe():
+    """One-line summary of the APIs that currently have a queue or are paused, for progress output."""
+    busy = [f"{name}: {s['queued']} queued" + (f", paused {s['paused_for']:.0f}s" if s['paused_for'] else "")
+            for name, s in stats().items() if s['queued'] or s['paused_for']]
+    return "; ".join(busy) or "no API queues"
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache import normalize_query
+from config import connect_sqlite, optional_resource
+
+# Finished reports, keyed by normalized company name, so a company someone already asked
+# about loads instantly for everyone on the deployment. Each part of a report is stored
+# with its own timestamp and goes stale on its own schedule: GitHub star counts age much
+# faster than the Gemini analysis, so only the stale parts have to be refreshed.
+REPORT_STORE_PATH = os.getenv("REPORT_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "reports.sqlite3"))
+REPORT_STORE_ENABLED = os.getenv("REPORT_STORE_ENABLED", "1") not in ("0", "false", "False")
+
+DAY = 24 * 60 * 60
+# Maximum age per part. "analysis" is the Gemini overview + use cases; the others are the
+# per-use-case resource lists. The PDF has no age of its own: it is re-rendered whenever
+# a part it shows is refreshed.
+PART_MAX_AGES = {
+    "analysis": float(os.getenv("REPORT_MAX_AGE_ANALYSIS", 30 * DAY)),
+    "datasets": float(os.getenv("REPORT_MAX_AGE_DATASETS", 7 * DAY)),
+    "repos": float(os.getenv("REPORT_MAX_AGE_REPOS", DAY)),
+    "papers": float(os.getenv("REPORT_MAX_AGE_PAPERS", 3 * DAY)),
+}
+BINARY_PARTS = {"pdf"}
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS report_parts ("
+    " company TEXT NOT NULL, part TEXT NOT NULL, value BLOB NOT NULL, updated REAL NOT NULL,"
+    " PRIMARY KEY (company, part))",
+)
+
+class StoredReport:
+    """The stored parts of one company's report: {part: (value, updated timestamp)}."""
+
+    def __init__(self, company, parts):
+        self.company = company
+        self.parts = parts
+
+    def get(self, part):
+        return self.parts[part][0] if part in self.parts else None
+
+    def updated(self, part):
+        return self.parts[part][1] if part in self.parts else None
+
+    def is_stale(self, part):
+        """Missing parts are stale too."""
+        if part not in self.parts:
+            return True
+        max_age = PART_MAX_AGES.get(part)
+        return max_age is not None and time.time() - self.parts[part][1] > max_age
+
+class ReportStore:
+    """SQLite-backed store of report parts, one row per (company, part)."""
+
+    def __init__(self, path=REPORT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(self.path, SCHEMA)
+        return self._conn
+
+    def load(self, company_name):
+        """Returns the StoredReport for `company_name`, or None if nothing is stored."""
+        company = normalize_query(company_name)
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT part, value, updated FROM report_parts WHERE company = ?", (company,)
+            ).fetchall()
+        if not rows:
+            return None
+        parts = {part: (bytes(value) if part in BINARY_PARTS else json.loads(value), updated)
+                 for part, value, updated in rows}
+        return StoredReport(company, parts)
+
+    def save(self, company_name, parts, remove=(), unchanged_since=None):
+        """
+        Stores (or replaces) the given parts, stamped with the current time, and deletes the parts
+        in `remove` (e.g. a PDF that no longer matches). Other parts are kept.
+        With `unchanged_since` (a timestamp), nothing is written unless the report exists and none
+        of its other parts was stored after that time, so a PDF rendered from an older version of
+        the report is never stored next to a newer one.
+        Returns the timestamp the parts were stored with, or None if they were not stored.
+        """
+        company = normalize_query(company_name)
+        now = time.time()
+        rows = [(company, part, value if part in BINARY_PARTS else json.dumps(value), now)
+                for part, value in parts.items()]
+        with self._lock:
+            conn = self._connection()
+            # One transaction, so a reader never sees refreshed resources next to the old PDF.
+            # IMMEDIATE takes the write lock up front, so no other process writes between check and write.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if unchanged_since is not None:
+                    updated = conn.execute(
+                        "SELECT part, updated FROM report_parts WHERE company = ?", (company,)).fetchall()
+                    if not updated or any(stamp > unchanged_since for part, stamp in updated if part not in parts):
+                        conn.execute("ROLLBACK")
+                        return None
+                conn.executemany(
+                    "INSERT OR REPLACE INTO report_parts (company, part, value, updated) VALUES (?, ?, ?, ?)", rows)
+                conn.executemany("DELETE FROM report_parts WHERE company = ? AND part = ?",
+                                 [(company, part) for part in remove])
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        return now
+
+    def delete(self, company_name):
+        with self._lock:
+            self._connection().execute("DELETE FROM report_parts WHERE company = ?", (normalize_query(company_name),))
+
+def _default_store():
+    return ReportStore()
+
+_store = optional_resource(_default_store, REPORT_STORE_ENABLED)
+
+def get_store():
+    """Returns the process-wide report store, or None when it is disabled."""
+    return _store()
+
+def set_store(store):
+    """Uses `store` (anything with load/save/delete) for all reports from now on; None turns storing off."""
+    _store.set(store)
+
+def load_report(company_name):
+    """Looks up a stored report. Returns None when there is none or the store can't be read."""
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        return store.load(company_name)
+    except sqlite3.Error as e:
+        print(f"Report store read failed for {company_name}: {e}")
+        return None
+
+def save_report(company_name, parts, remove=(), unchanged_since=None):
+    """
+    Stores report parts (see ReportStore.save). A failed write is printed, not raised: the report
+    was already generated and is still shown. Returns the timestamp the parts were stored with, or None if they were not stored.
+    """
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        return store.save(company_name, parts, remove, unchanged_since)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        print(f"Report store write failed for {company_name}: {e}")
+        return None
@@ -0,0 +1,195 @@
+"""
+Offline resource index for datasets, repos and papers.
+
+Builds a compact inverted index from a JSONL metadata dump (one record per line with
+`title`, `description`, `url` and optionally `stars`/`name`) and answers the same keyword
+queries the live finders send, ranked with BM25. Everything is stored as flat files that
+are memory-mapped on load, so lookups need no network and almost no start-up work.
+
+Usage:
+    python resource_index.py build repos github_dump.jsonl --index-dir index
+    python resource_index.py query repos "Nvidia GPU demand forecasting" --index-dir index
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+import threading
+from collections import Counter
+
+import numpy as np
+
+from keywords import tokenize
+
+INDEX_DIR = os.getenv("RESOURCE_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "index"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOP_K = 3
+
+def _query_terms(query):
+    # Live queries join keywords with ' OR ' (GitHub/ArXiv) or spaces (Kaggle)
+    return list(dict.fromkeys(word for word in query.lower().split() if word != 'or'))
+
+def build_index(dump_path, out_dir):
+    """Reads a JSONL metadata dump and writes the index files to `out_dir`. Returns the document count."""
+    os.makedirs(out_dir, exist_ok=True)
+    vocab = {}
+    postings = []   # per term id: list of (doc id, term frequency)
+    doc_lengths = []
+    doc_stars = []
+    doc_offsets = [0]
+
+    with open(dump_path, encoding='utf-8') as dump, open(os.path.join(out_dir, 'docs.jsonl'), 'wb') as docs:
+        for line in dump:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            title = record.get('title') or record.get('name') or ''
+            if not title or not record.get('url'):
+                continue
+            doc = {
+                'title': title,
+                'name': record.get('name') or title,
+                'url': record['url'],
+                'stars': int(record.get('stars') or 0),
+            }
+            doc_id = len(doc_lengths)
+            # The title is counted twice so it outweighs the description, like in the ArXiv scoring
+            tokens = tokenize(title) * 2 + tokenize(record.get('description') or '')
+            for term, tf in Counter(tokens).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_id, tf))
+            doc_lengths.append(len(tokens))
+            doc_stars.append(doc['stars'])
+            docs.write(json.dumps(doc, ensure_ascii=False).encode('utf-8') + b'\n')
+            doc_offsets.append(docs.tell())
+
+    if not doc_lengths:
+        raise ValueError(f"No usable records (with a title and url) found in {dump_path}")
+
+    offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(p) for p in postings])
+    doc_ids = np.fromiter((doc for p in postings for doc, _ in p), dtype=np.int32, count=int(offsets[-1]))
+    tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(offsets[-1]))
+
+    np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(out_dir, 'doc_ids.npy'), doc_ids)
+    np.save(os.path.join(out_dir, 'tfs.npy'), tfs)
+    np.save(os.path.join(out_dir, 'doc_lengths.npy'), np.asarray(doc_lengths, dtype=np.float32))
+    np.save(os.path.join(out_dir, 'doc_offsets.npy'), np.asarray(doc_offsets, dtype=np.int64))
+    np.save(os.path.join(out_dir, 'stars.npy'), np.asarray(doc_stars, dtype=np.int64))
+    with open(os.path.join(out_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f)
+    return len(doc_lengths)
+
+class ResourceIndex:
+    """A built index, memory-mapped from disk."""
+
+    def __init__(self, index_dir):
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode='r')
+        self.offsets = load('offsets.npy')
+        self.doc_ids = load('doc_ids.npy')
+        self.tfs = load('tfs.npy')
+        self.doc_lengths = load('doc_lengths.npy')
+        self.doc_offsets = load('doc_offsets.npy')
+        self.stars = load('stars.npy')
+        with open(os.path.join(index_dir, 'vocab.json'), encoding='utf-8') as f:
+            self.vocab = json.load(f)
+        self.num_docs = len(self.doc_lengths)
+        self.avg_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+        self._docs_file = open(os.path.join(index_dir, 'docs.jsonl'), 'rb')
+        self._docs = mmap.mmap(self._docs_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def document(self, doc_id):
+        start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+        return json.loads(self._docs[start:end])
+
+    def search(self, query, k=TOP_K):
+        """Returns up to `k` (doc id, score) pairs ranked by BM25, ties broken by stars."""
+        term_ids = [self.vocab[term] for term in _query_terms(query) if term in self.vocab]
+        if not term_ids:
+            return []
+
+        ids, weights = [], []
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = np.asarray(self.doc_ids[start:end])
+            tf = np.asarray(self.tfs[start:end])
+            idf = np.log(1.0 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[docs] / self.avg_length)
+            ids.append(docs)
+            weights.append(idf * tf * (BM25_K1 + 1.0) / (tf + norm))
+
+        # Sum the per-term contributions of every candidate document. Within one term a document
+        # appears only once, so plain fancy-index accumulation is safe. Short posting lists use a
+        # sparse merge; long ones a dense score array, which is cheaper than sorting them.
+        total = sum(len(docs) for docs in ids)
+        if total * 8 < self.num_docs:
+            candidates, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(weights))
+        else:
+            dense = np.zeros(self.num_docs, dtype=np.float32)
+            for docs, weight in zip(ids, weights):
+                dense[docs] += weight
+            candidates = np.flatnonzero(dense)
+            scores = dense[candidates]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((-self.stars[candidates], -scores))
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(key, index_dir=None):
+    """Loads (once per process) the index for a resource source key such as 'repos'."""
+    path = os.path.join(index_dir or INDEX_DIR, key)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = ResourceIndex(path)
+        return _indexes[path]
+
+def _format(key, doc):
+    # Same result shapes as the live finders
+    if key == 'repos':
+        return {'name': doc['name'], 'url': doc['url'], 'stars': doc['stars']}
+    return {'title': doc['title'], 'url': doc['url']}
+
+def offline_finder(key, extract_keywords, k=TOP_K):
+    """Returns a finder for `key` that answers from the local index instead of a live API."""
+    def find(heading):
+        index = get_index(key)
+        query = extract_keywords(heading)
+        return [_format(key, index.document(doc_id)) for doc_id, _ in index.search(query, k)]
+    find.__name__ = f"find_{key}_offline"
+    return find
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the offline resource index.")
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Index a JSONL metadata dump")
+    build.add_argument("source", choices=["datasets", "repos", "papers"])
+    build.add_argument("dump", help="JSONL file with title/description/url/stars records")
+    query = commands.add_parser("query", help="Run a keyword query against an index")
+    query.add_argument("source", choices=["datasets", "repos", "papers"])
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=TOP_K)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_index(args.dump, os.path.join(args.index_dir, args.source))
+        print(f"Indexed {count} {args.source} into {os.path.join(args.index_dir, args.source)}")
+    else:
+        index = get_index(args.source, args.index_dir)
+        for doc_id, score in index.search(' '.join(tokenize(args.text)), args.k):
+            print(f"{score:.3f}  {json.dumps(_format(args.source, index.document(doc_id)))}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import tracing
+import keywords
+from rate_limiter import RateLimited
+import github_api
+import arxiv_api
+import kaggle_api
+from github_api import find_github_repos, find_github_repos_batch
+from arxiv_api import find_arxiv_papers, find_arxiv_papers_batch
+from kaggle_api import find_kaggle_datasets
+
+# Each resource source: (result key, finder function, max concurrent calls to that source, batch finder).
+# A batch finder takes a list of queries and returns one result list per query in a single call,
+# or None to have them looked up query by query; sources without one are always looked up that way.
+# Every source gets its own pool sized to its cap, so a throttled API can't starve the others.
+# The pools are shared by the whole process, so the caps hold across concurrent reports too.
+LIVE_SOURCES = [
+    ("datasets", find_kaggle_datasets, 5, None),
+    ("repos", find_github_repos, 5, find_github_repos_batch),
+    ("papers", find_arxiv_papers, 2, find_arxiv_papers_batch),
+]
+
+# Offline lookups answer the same keyword queries the live finders would send
+KEYWORD_EXTRACTORS = {
+    "datasets": kaggle_api._extract_keywords,
+    "repos": github_api._extract_keywords,
+    "papers": arxiv_api._extract_keywords,
+}
+OFFLINE_CAP = 4
+BACKENDS = ("live", "offline")
+
+def _source_for_backend(live_source, backend):
+    key = live_source[0]
+    if backend == "live":
+        return live_source
+    if backend == "offline":
+        # Imported lazily so numpy is only needed when an offline backend is actually used
+        from resource_index import offline_finder
+        return (key, offline_finder(key, KEYWORD_EXTRACTORS[key]), OFFLINE_CAP, None)
+    raise ValueError(f"Unknown resource backend '{backend}' for {key}; expected one of {BACKENDS}")
+
+# Each source picks its backend from RESOURCE_BACKEND_<KEY> (e.g. RESOURCE_BACKEND_REPOS=offline)
+RESOURCE_SOURCES = [
+    _source_for_backend(source, os.getenv(f"RESOURCE_BACKEND_{source[0].upper()}", "live"))
+    for source in LIVE_SOURCES
+]
+
+def set_backend(key, backend):
+    """Switches one source (datasets, repos or papers) between the 'live' and 'offline' backends."""
+    for i, source in enumerate(LIVE_SOURCES):
+        if source[0] == key:
+            RESOURCE_SOURCES[i] = _source_for_backend(source, backend)
+            return
+    raise ValueError(f"Unknown resource source '{key}'")
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _pool(key, cap):
+    with _pools_lock:
+        if (key, cap) not in _pools:
+            _pools[(key, cap)] = ThreadPoolExecutor(max_workers=cap, thread_name_prefix=f"resources-{key}")
+        return _pools[(key, cap)]
+
+def _safe_lookup(key, finder, query):
+    """
+    Runs a single lookup; a failure in one source never sinks the whole report. RateLimited is
+    raised on, so the source is left out of the report (and looked up again later) rather than
+    being recorded as having found nothing.
+    """
+    with tracing.span("lookup", source=key, query=query) as span:
+        try:
+            results = finder(query)
+            span.tag(results=len(results))
+            return results
+        except RateLimited as e:
+            span.tag(error=f"RateLimited: {e}")
+            raise
+        except Exception as e:
+            span.tag(error=f"{type(e).__name__}: {e}")
+            print(f"Error during resource lookup for '{query}': {e}")
+            return []
+
+def _safe_batch_lookup(key, batch_finder, queries):
+    with tracing.span("lookup", source=key, batch=len(queries)) as span:
+        try:
+            results = batch_finder(queries)
+            if results is None:
+                span.tag(fallback=True)
+                return None
+            if len(results) == len(queries):
+                return results
+            span.tag(error="result count mismatch")
+            print(f"Batch resource lookup returned {len(results)} results for {len(queries)} queries")
+        except RateLimited as e:
+            span.tag(error=f"RateLimited: {e}")
+            raise
+        except Exception as e:
+            span.tag(error=f"{type(e).__name__}: {e}")
+            print(f"Error during batch resource lookup: {e}")
+        return [[] for _ in queries]
+
+class _SharedLookup:
+    """A lookup several queries wait on; it is only cancelled once every one of them has given up on it."""
+
+    def __init__(self, future, users):
+        self.future = future
+        self._users = users
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            return self.future.cancel() if self._users == 0 else False
+
+class _SharedItem:
+    """Future-like view of one query's use of a _SharedLookup."""
+
+    def __init__(self, shared):
+        self._shared = shared
+        self._released = False
+
+    def result(self, timeout=None):
+        return self._shared.future.result(timeout)
+
+    def done(self):
+        return self._shared.future.done()
+
+    def cancel(self):
+        if self._released:
+            return False
+        self._released = True
+        return self._shared.release()
+
+def _submit_each(pool, key, finder, queries, lookup=None):
+    """Submits one lookup per query to `pool`; queries with the same canonical keywords share one."""
+    lookup = lookup or tracing.propagate(_safe_lookup)
+    canonicals = keywords.query_keys(queries, key)
+    shared = {}
+    for query, canonical in zip(queries, canonicals):
+        if canonical not in shared:
+            shared[canonical] = pool.submit(lookup, key, finder, query)
+    users = {canonical: canonicals.count(canonical) for canonical in shared}
+    for canonical, future in shared.items():
+        if users[canonical] > 1:
+            shared[canonical] = _SharedLookup(future, users[canonical])
+    return [_SharedItem(shared[canonical]) if users[canonical] > 1 else shared[canonical] for canonical in canonicals]
+
+class _BatchLookup:
+    """
+    A batch lookup on a source's pool. If the batch finder returns None, the queries are
+    submitted one by one to the same pool as soon as it does, so they still run in parallel.
+    """
+
+    def __init__(self, pool, key, finder, batch_finder, queries):
+        self._pool, self._key, self._finder, self._queries = pool, key, finder, list(queries)
+        # Bound here, so fallback lookups started from a pool thread keep the report's trace
+        self._lookup = tracing.propagate(_safe_lookup)
+        self._lock = threading.Lock()
+        self._fallback = None
+        self.future = pool.submit(tracing.propagate(_safe_batch_lookup), key, batch_finder, self._queries)
+        self.shared = _SharedLookup(self.future, len(self._queries))
+        self.future.add_done_callback(self._on_done)
+
+    def fell_back(self):
+        """True once the batch finder has returned None."""
+        future = self.future
+        return future.done() and not future.cancelled() and future.exception() is None and future.result() is None
+
+    def _on_done(self, _):
+        if self.fell_back():
+            self.fallback()
+
+    def fallback(self):
+        with self._lock:
+            if self._fallback is None:
+                self._fallback = _submit_each(self._pool, self._key, self._finder, self._queries, self._lookup)
+            return self._fallback
+
+class _BatchItem:
+    """Future-like view of one query's share of a batch lookup."""
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+        self._released = False
+
+    def result(self, timeout=None):
+        started = time.monotonic()
+        results = self._batch.future.result(timeout)
+        if results is not None:
+            return results[self._index]
+        remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+        return self._batch.fallback()[self._index].result(remaining)
+
+    def done(self):
+        if self._batch.fell_back():
+            return self._batch.fallback()[self._index].done()
+        return self._batch.future.done()
+
+    def cancel(self):
+        if self._batch.fell_back():
+            return self._batch.fallback()[self._index].cancel()
+        if self._released:
+            return False
+        self._released = True
+        return self._batch.shared.release()
+
+def batched_keys():
+    """Keys of the sources that answer all queries of a report in one call."""
+    return [key for key, _, _, batch_finder in RESOURCE_SOURCES if batch_finder]
+
+def submit_resource_lookups(queries, keys=None):
+    """
+    Starts the lookups for `queries` in the background, optionally only for the source `keys`.
+    Returns one dict of futures per query, keyed by source.
+    """
+    per_query = [{} for _ in queries]
+    for key, finder, cap, batch_finder in RESOURCE_SOURCES:
+        if keys is not None and key not in keys:
+            continue
+        pool = _pool(key, cap)
+        if batch_finder and len(queries) > 1:
+            batch = _BatchLookup(pool, key, finder, batch_finder, queries)
+            for index, futures in enumerate(per_query):
+                futures[key] = _BatchItem(batch, index)
+        else:
+            for futures, future in zip(per_query, _submit_each(pool, key, finder, queries)):
+                futures[key] = future
+    return per_query
+
+def collect_resources(futures, expires=None):
+    """
+    Waits for one query's futures from submit_resource_lookups and returns their results.
+    With `expires` (a time.monotonic() value), lookups still running at that point are left
+    out of the result, so the report completes with partial results; they are cancelled once
+    no other query shares them. Lookups that were rate limited are left out the same way.
+    """
+    found = {}
+    for key, future in futures.items():
+        timeout = None if expires is None else max(0.0, expires - time.monotonic())
+        try:
+            found[key] = future.result(timeout)
+        except (FutureTimeoutError, CancelledError):
+            future.cancel()
+            print(f"Resource lookup for {key} missed its deadline; continuing without it")
+        except RateLimited as e:
+            print(f"Resource lookup for {key} was rate limited; continuing without it: {e}")
+    return found
+
+def find_resources(queries, timeout=None, keys=None):
+    """
+    Looks up datasets, repos and papers (or only the source `keys`) for every query concurrently.
+    Returns one dict per query, in the same order as `queries`, with a list per source key.
+    Lookups that haven't finished after `timeout` seconds are left out.
+    """
+    expires = None if timeout is None else time.monotonic() + timeout
+    return [collect_resources(futures, expires) for futures in submit_resource_lookups(queries, keys)]
@@ -0,0 +1,140 @@
+import codecs
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from html.parser import HTMLParser
+
+import requests
+
+import http_client
+import tracing
+from cache import cache_get, cache_set
+
+# Limits for a single scraped page. We only ever keep MAX_TEXT_CHARS of text,
+# so there is no point downloading or parsing much more than that.
+MAX_TEXT_CHARS = 4000
+MAX_BODY_BYTES = 512 * 1024
+PAGE_TIMEOUT = 10
+CHUNK_SIZE = 16 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+SKIPPED_TAGS = {'script', 'style', 'header', 'footer', 'nav', 'aside', 'noscript', 'template'}
+HEADERS = {'User-Agent': 'Mozilla/5.0', 'Accept': 'text/html,application/xhtml+xml'}
+
+class _TextExtractor(HTMLParser):
+    """Incremental HTML-to-text parser that stops collecting once the character budget is reached."""
+
+    def __init__(self, max_chars):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.skip_depth = 0
+
+    @property
+    def done(self):
+        return self.length >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth or self.done:
+            return
+        text = ' '.join(data.split())
+        if text:
+            self.parts.append(text)
+            self.length += len(text) + 1
+
+    def text(self):
+        return ' '.join(self.parts)[:self.max_chars]
+
+def _is_html(response):
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    # Servers that omit the header are usually still serving HTML.
+    return not content_type or content_type in HTML_CONTENT_TYPES
+
+def parse_website(url, max_chars=MAX_TEXT_CHARS, max_bytes=MAX_BODY_BYTES, timeout=PAGE_TIMEOUT, cancel=None):
+    """
+    Streams a page and extracts its visible text, up to `max_chars` characters.
+    Non-HTML responses are rejected from their headers, and the download stops
+    after `max_bytes`, as soon as enough text has been collected, or when the
+    optional `cancel` event is set.
+    """
+    # Pages are cached so repeat reports can rebuild the same Gemini prompt (and hit its cache)
+    cache_key = f"{url} {max_chars}"
+    found, text = cache_get("page", cache_key)
+    if found:
+        return text, None
+    try:
+        with http_client.get(url, headers=HEADERS, timeout=(min(http_client.CONNECT_TIMEOUT, timeout), timeout), stream=True) as response:
+            response.raise_for_status()
+            if not _is_html(response):
+                return None, f"Skipped {url}: unsupported content type '{response.headers.get('Content-Type')}'"
+
+            # requests assumes ISO-8859-1 when no charset is declared; modern pages are almost always UTF-8.
+            charset_declared = 'charset' in response.headers.get('Content-Type', '').lower()
+            encoding = response.encoding if charset_declared and response.encoding else 'utf-8'
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            parser = _TextExtractor(max_chars)
+            received = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if parser.done or received >= max_bytes:
+                    break
+                if cancel is not None and cancel.is_set():
+                    return None, f"Cancelled scraping {url}"
+            else:
+                parser.feed(decoder.decode(b'', final=True))
+            parser.close()
+
+        text = parser.text()
+        if not text:
+            return None, f"No readable text found at {url}"
+        cache_set("page", cache_key, text)
+        return text, None
+    except (requests.exceptions.RequestException, LookupError) as e:
+        return None, f"Error parsing website {url}: {e}"
+
+def scrape_pages(urls, max_workers=5):
+    """
+    Scrapes all `urls` in parallel. Returns a list of (content, error) tuples
+    in the same order as `urls`.
+    """
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls)), thread_name_prefix="scraper") as executor:
+        return list(executor.map(tracing.propagate(parse_website), urls))
+
+def scrape_first_pages(urls, needed, timeout=None, max_workers=5):
+    """
+    Hedged scraping: starts all `urls` at once and keeps the first `needed` pages that succeed,
+    then cancels the stragglers. Gives up after `timeout` seconds with whatever has arrived.
+    Returns the page texts in the original search-result order.
+    """
+    if not urls:
+        return []
+    cancel = threading.Event()
+    page_timeout = min(PAGE_TIMEOUT, timeout) if timeout else PAGE_TIMEOUT
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(urls)), thread_name_prefix="scraper")
+    futures = {executor.submit(tracing.propagate(parse_website), url, timeout=page_timeout, cancel=cancel): rank
+               for rank, url in enumerate(urls)}
+    pages = {}
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            content, _ = future.result()
+            if content:
+                pages[futures[future]] = content
+                if len(pages) >= needed:
+                    break
+    except FutureTimeoutError:
+        print(f"Scraping budget of {timeout:.1f}s used up with {len(pages)}/{needed} pages")
+    finally:
+        # Stop in-flight downloads at their next chunk and drop the ones that haven't started
+        cancel.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [pages[rank] for rank in sorted(pages)]
@@ -0,0 +1,246 @@
+"""
+Lightweight tracing and metrics for the report pipeline.
+
+Wrap work in `span("stage", stage="gemini")` (or "http", "lookup", ...) and tag it with
+source/status/bytes/cache_hit as it runs. Finished spans are
+  - kept in memory so a report's timing breakdown can be shown (see `breakdown`),
+  - aggregated into Prometheus-style histograms and counters (`render_prometheus`,
+    optionally served over HTTP with `start_metrics_server` or METRICS_PORT),
+  - logged as one JSON object per span on the "tracing" logger when TRACE_LOG=1.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger("tracing")
+if os.getenv("TRACE_LOG", "0") not in ("0", "false", "False") and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+MAX_SPANS = 5000
+# Only these tags become metric labels; everything else (queries, urls...) stays in the span logs
+LABEL_TAGS = ("stage", "source", "host", "method", "status")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current = contextvars.ContextVar("current_span", default=None)
+_lock = threading.Lock()
+_spans = deque(maxlen=MAX_SPANS)
+_histograms = {}   # (metric, labels) -> [bucket counts..., count, sum]
+_counters = {}     # (metric, labels) -> value
+_gauges = {}       # (metric, labels) -> value
+
+class Span:
+    def __init__(self, name, trace_id, parent_id, tags):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.tags = {k: v for k, v in tags.items() if v is not None}
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+    def tag(self, **tags):
+        self.tags.update({k: v for k, v in tags.items() if v is not None})
+
+    def to_dict(self):
+        return {
+            "name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+            "parent_id": self.parent_id, "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "error": self.error, **self.tags,
+        }
+
+def _labels(tags):
+    return tuple((key, str(tags[key])) for key in LABEL_TAGS if tags.get(key) is not None)
+
+def count(metric, value=1, **labels):
+    """Increments a counter, e.g. count("http_retries_total", host="api.github.com")."""
+    key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def gauge(metric, value, **labels):
+    """Sets a gauge to its current value, e.g. gauge("rate_limit_queue_depth", 3, source="arxiv")."""
+    key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+    with _lock:
+        _gauges[key] = value
+
+def _observe(metric, labels, seconds):
+    key = (metric, labels)
+    with _lock:
+        histogram = _histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+def start_span(name, parent=None, **tags):
+    """
+    Starts a span without making it the active one; call finish_span() when done.
+    Useful where a `with` block can't be used, e.g. across the yields of a generator.
+    """
+    parent = parent or _current.get()
+    current = Span(name, parent.trace_id if parent else uuid.uuid4().hex[:16], parent.span_id if parent else None, tags)
+    current._started = time.perf_counter()
+    return current
+
+def finish_span(current, error=None):
+    current.duration = time.perf_counter() - current._started
+    if error is not None:
+        current.error = error
+    _finish(current)
+
+@contextlib.contextmanager
+def span(name, parent=None, **tags):
+    """Times the enclosed block as a span. Nested spans (in the same context) share a trace id."""
+    current = start_span(name, parent, **tags)
+    token = _current.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        finish_span(current, error)
+
+def _finish(current):
+    labels = _labels(current.tags)
+    _observe(f"{current.name}_seconds", labels, current.duration)
+    if current.error or current.tags.get("error"):
+        count("errors_total", span=current.name, **dict(labels))
+    with _lock:
+        _spans.append(current)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(current.to_dict(), default=str))
+
+@contextlib.contextmanager
+def activate(current):
+    """Makes an already started span the parent of spans opened inside the block, without finishing it."""
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+def current_span():
+    return _current.get()
+
+def tag(**tags):
+    """Adds tags to the innermost active span, if there is one."""
+    active = _current.get()
+    if active is not None:
+        active.tag(**tags)
+
+def propagate(func):
+    """Binds `func` to the caller's trace context, for work handed to thread pools."""
+    context = contextvars.copy_context()
+    # Each call gets its own copy: one Context can't be entered by two threads at once
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+def spans_for(trace_id):
+    with _lock:
+        return [s for s in _spans if s.trace_id == trace_id]
+
+def breakdown(trace_id):
+    """Per-span timing rows for one trace (e.g. one report), in start order."""
+    rows = []
+    for s in sorted(spans_for(trace_id), key=lambda s: s.start):
+        label = s.tags.get("stage") or s.tags.get("source") or s.tags.get("host") or ""
+        rows.append({
+            "span": s.name, "detail": label,
+            "ms": round(s.duration * 1000, 1),
+            "status": s.tags.get("status", "error" if s.error else ""),
+            "bytes": s.tags.get("bytes", ""),
+            "cache_hit": s.tags.get("cache_hit", ""),
+        })
+    return rows
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+    seen = set()
+    for (metric, labels), values in histograms:
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} histogram")
+            seen.add(metric)
+        for bound, bucket in zip(BUCKETS, values):
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {bucket}")
+        lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {values[-2]}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {values[-2]}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {values[-1]:.6f}")
+    for (metric, labels), value in counters:
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+    for (metric, labels), value in gauges:
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} gauge")
+            seen.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+_server = None
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serves render_prometheus() at http://host:port/metrics from a background thread (once per process)."""
+    global _server
+    if _server is not None:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+    return _server
+
+if os.getenv("METRICS_PORT"):
+    try:
+        start_metrics_server(int(os.environ["METRICS_PORT"]))
+    except OSError as e:
+        # Streamlit re-imports modules on rerun; the port may already be taken by this process
+        print(f"Metrics server not started: {e}")
@@ -1,54 +1,46 @@
-import os
-from bs4 import BeautifulSoup
+import re
+import time
 import requests
+import http_client
+import model_router
+import tracing
 import json
-from pdf_generator import create_pdf
-from github_api import find_github_repos
-from arxiv_api import find_arxiv_papers
-from kaggle_api import find_kaggle_datasets
-
-try:
-    import streamlit as st
-except ImportError:
-    st = None 
-
-if st and hasattr(st, 'secrets'):
-    GEMINI_API_KEY = st.secrets.get("GEMINI_API_KEY")
-    GOOGLE_API_KEY = st.secrets.get("GOOGLE_API_KEY")
-    GOOGLE_CSE_ID = st.secrets.get("GOOGLE_CSE_ID")
-else:
-    from dotenv import load_dotenv
-    load_dotenv()
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-    GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
-
-def search_google(company_name):
+import hashlib
+import report_store
+from cache import cache_get, cache_set
+from resources import find_resources, submit_resource_lookups, collect_resources, batched_keys, RESOURCE_SOURCES
+from gemini_stream import IncrementalReportParser, iter_sse_text, clean_json_text
+from scraper import parse_website, scrape_pages, scrape_first_pages
+from context_prep import prepare_context, estimate_tokens
+from deadline import Deadline, DEFAULT_DEADLINE, stage_timeout, call_with_timeout
+from config import GOOGLE_API_KEY, GOOGLE_CSE_ID
+
+# Total time for the Gemini answer; model_router splits it across fallback models
+GEMINI_TIMEOUT = 90
+# Pages whose text goes into the prompt, plus extra search results scraped as hedges
+PAGES_NEEDED = 3
+HEDGE_PAGES = 2
+
+def search_google(company_name, num=PAGES_NEEDED, timeout=None):
     url = "https://www.googleapis.com/customsearch/v1"
     query = f"about {company_name} business model and products"
-    params = {'key': GOOGLE_API_KEY, 'cx': GOOGLE_CSE_ID, 'q': query, 'num': 3}
+    params = {'key': GOOGLE_API_KEY, 'cx': GOOGLE_CSE_ID, 'q': query, 'num': num}
+    cache_key = query if num == PAGES_NEEDED else f"{query} num={num}"
+    found, items = cache_get("google_search", cache_key)
+    if found:
+        return items, None
     try:
-        response = requests.get(url, params=params)
+        response = http_client.get(url, params=params, timeout=timeout)
         response.raise_for_status()
-        return response.json().get('items', []), None
+        items = response.json().get('items', [])
+        if items:
+            cache_set("google_search", cache_key, items)
+        return items, None
     except requests.exceptions.RequestException as e:
         return [], f"Error during Google search: {e}"
 
-def parse_website(url):
-    try:
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        for tag in soup(['script', 'style', 'header', 'footer', 'nav', 'aside']):
-            tag.decompose()
-        text = soup.get_text(separator=' ', strip=True)
-        return ' '.join(text.split())[:4000], None
-    except requests.exceptions.RequestException as e:
-        return None, f"Error parsing website {url}: {e}"
-
-def generate_use_cases_with_gemini(company_name, company_info):
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-    prompt = f"""
+def _build_prompt(company_name, company_info):
+    return f"""
     Analyze the following information for {company_name} and generate a report for a technical audience.
     Company Information: "{company_info}"
 
@@ -69,54 +61,415 @@ def generate_use_cases_with_gemini(company_name, company_info):
       ]
     }}
     """
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+
+def _gemini_cache_key(company_name, company_info):
+    # Same company + same scraped context means the same prompt, so the answer can be reused
+    return f"{company_name} {hashlib.sha1(company_info.encode('utf-8')).hexdigest()}"
+
+def _cache_use_cases(cache_key, use_cases_data):
+    if isinstance(use_cases_data, dict) and use_cases_data.get('use_cases'):
+        cache_set("gemini", cache_key, use_cases_data)
+
+def generate_use_cases_with_gemini(company_name, company_info, timeout=GEMINI_TIMEOUT):
+    """
+    Asks the best available Gemini model (see model_router), falling back to the next one if it times out or is throttled.
+    Reads the streamed answer: generateContent sends nothing until the whole report is written, so a
+    per-model timeout there would cut off healthy models that simply need the usual 20-60 s.
+    """
+    for kind, payload in stream_use_cases_with_gemini(company_name, company_info, timeout=timeout):
+        if kind == "complete":
+            return payload, None
+        if kind == "error":
+            return {}, payload
+    return {}, "Error with Gemini API: no model answered in time."
+
+def stream_use_cases_with_gemini(company_name, company_info, timeout=GEMINI_TIMEOUT, deadline=None):
+    """
+    Streams the report from streamGenerateContent, trying the models like generate_use_cases_with_gemini.
+    Yields ("overview", str) and ("use_case", dict) as soon as each section is complete,
+    then ("complete", full_data) at the end, or ("error", message) if anything fails.
+    If `deadline` runs out mid-stream, the use cases received so far are completed as a partial report.
+    """
+    cache_key = _gemini_cache_key(company_name, company_info)
+    found, use_cases_data = cache_get("gemini", cache_key)
+    if found:
+        yield "overview", use_cases_data.get('overview', 'No overview generated.')
+        for case in use_cases_data.get('use_cases', []):
+            yield "use_case", case
+        yield "complete", use_cases_data
+        return
+
+    payload = {"contents": [{"parts": [{"text": _build_prompt(company_name, company_info)}]}]}
+    error = "Error with Gemini API: no model answered in time."
+    for model, attempt_timeout in model_router.attempts(timeout):
+        url = model_router.model_url(model, "streamGenerateContent", alt="sse")
+        parser = IncrementalReportParser()
+        started = False
+        try:
+            # The read timeout applies between chunks, so a stalled stream still fails fast
+            with http_client.post(url, json=payload, timeout=(http_client.CONNECT_TIMEOUT, attempt_timeout),
+                                  stream=True, requeue=False, retries=False, max_wait=attempt_timeout) as response:
+                response.raise_for_status()
+                for text in iter_sse_text(response):
+                    for event in parser.feed(text):
+                        started = True
+                        yield event
+                    if deadline is not None and deadline.expired() and parser.use_cases:
+                        print(f"Report deadline reached after {len(parser.use_cases)} use cases; using those")
+                        model_router.report_success(model)
+                        yield "complete", {"overview": parser.overview or 'No overview generated.',
+                                           "use_cases": parser.use_cases, "partial": True}
+                        return
+            use_cases_data = parser.result()
+        except (requests.RequestException, json.JSONDecodeError, KeyError, IndexError) as e:
+            error = f"Error with Gemini API ({model}): {e}. Response so far: {parser.buffer or 'No API response'}"
+            # Once sections have been shown, another model's answer can't be stitched onto them
+            if (isinstance(e, requests.RequestException) and model_router.report_failure(model, e, attempt_timeout)
+                    and not started):
+                continue
+            yield "error", error
+            return
+        model_router.report_success(model)
+        tracing.tag(model=model)
+        _cache_use_cases(cache_key, use_cases_data)
+        yield "complete", use_cases_data
+        return
+    yield "error", error
+
+def gather_company_info(company_name, deadline=None):
+    """Searches for the company and scrapes the result pages. Returns (company_info, error)."""
+    with tracing.span("stage", stage="search") as span:
+        if deadline is None:
+            search_results, error = search_google(company_name)
+        else:
+            # Over-request results so slow or blocked sites can be skipped instead of waited on
+            timeout = deadline.budget("search")
+            try:
+                search_results, error = call_with_timeout(timeout, search_google, company_name,
+                                                          num=PAGES_NEEDED + HEDGE_PAGES, timeout=timeout)
+            except TimeoutError as e:
+                search_results, error = [], f"Google search timed out: {e}"
+        span.tag(results=len(search_results), error=error)
+    if error: return None, error
+    if not search_results: return None, "Could not find any info for the company."
+
+    urls = [result['link'] for result in search_results if result.get('link')]
+    with tracing.span("stage", stage="scrape") as span:
+        if deadline is None:
+            # Result pages are fetched in parallel, each streamed with a byte and text cap
+            pages = [content for content, _ in scrape_pages(urls) if content]
+        else:
+            pages = scrape_first_pages(urls, PAGES_NEEDED, timeout=deadline.budget("scrape"))
+        span.tag(pages=len(pages), bytes=sum(len(page) for page in pages))
+
+    with tracing.span("stage", stage="context") as span:
+        # Deduplicated, most relevant sentences only: fewer prompt tokens for Gemini to read
+        company_info = prepare_context(pages, company_name)
+        span.tag(raw_tokens=sum(estimate_tokens(page) for page in pages), tokens=estimate_tokens(company_info))
+
+    if not company_info: return None, "Could not parse websites; they may block scrapers."
+    return company_info, None
+
+def _format_use_case(case, found, lookups_done=False):
+    """With `lookups_done`, sources whose lookup failed or timed out are listed under "missing"."""
+    formatted = {
+        "heading": case.get('heading', 'No heading'),
+        "description": case.get('description', ''),
+        "implementation_steps": case.get('implementation_steps', []),
+        "datasets": found.get("datasets", []),
+        "repos": found.get("repos", []),
+        "papers": found.get("papers", [])
+    }
+    missing = [key for key, _, _, _ in RESOURCE_SOURCES if key not in found]
+    if lookups_done and missing:
+        formatted["missing"] = missing
+    return formatted
+
+def _pdf_filename(company_name):
+    """
+    A file name that is safe to write and to send in a header: only [A-Za-z0-9_.-], plus a short
+    hash of the name whenever characters had to be dropped, so "AC/DC" and "ACDC" don't collide.
+    """
+    name = company_name.replace(' ', '_')
+    safe = re.sub(r'[^\w.-]', '', name, flags=re.ASCII).strip('.')
+    if safe != name or not safe:
+        safe = f"{safe}_{hashlib.sha1(company_name.encode('utf-8')).hexdigest()[:8]}".lstrip('_')
+    return f"{safe}_AI_ML_Report.pdf"
+
+def _report_parts(overview, cases, resources, pdf_bytes=None):
+    """
+    Splits a finished report into the parts the report store ages separately. A source is only
+    included when every lookup for it finished and found something; otherwise it is left
+    missing (so stale) and looked up again the next time the report is loaded.
+    """
+    parts = {"analysis": {"overview": overview, "use_cases": [
+        {key: case.get(key) for key in ("heading", "description", "implementation_steps")} for case in cases]}}
+    for key, _, _, _ in RESOURCE_SOURCES:
+        lists = [found.get(key) for found in resources]
+        if all(found is not None for found in lists) and any(lists):
+            parts[key] = lists
+    if pdf_bytes is not None:
+        parts["pdf"] = pdf_bytes
+    return parts
+
+def _save_report(company_name, overview, cases, resources, pdf_bytes):
+    """
+    Stores a newly generated report, dropping any parts left over from an older one.
+    Returns the time it was stored at, or None if it wasn't.
+    """
+    parts = _report_parts(overview, cases, resources, pdf_bytes)
+    stale = [key for key, _, _, _ in RESOURCE_SOURCES if key not in parts] + ([] if "pdf" in parts else ["pdf"])
+    return report_store.save_report(company_name, parts, remove=stale)
+
+def stored_report(company_name, deadline=None, render_pdf=True):
+    """
+    Returns the stored report for the company as (overview, formatted_use_cases, pdf_bytes, stored_at,
+    version), or None when there is no fresh stored analysis. Stale resource lists are looked up again
+    (and the PDF re-rendered) first; the rest of the report is served as stored. Without `render_pdf`,
+    pdf_bytes is None whenever the stored PDF is missing or out of date. `version` is the time the
+    report as returned was stored at (see _deferred_pdf), or None if it could not be stored.
+    """
+    stored = report_store.load_report(company_name)
+    if stored is None or stored.is_stale("analysis"):
+        return None
+    with tracing.span("stage", stage="store") as span:
+        overview = stored.get("analysis")["overview"]
+        cases = stored.get("analysis")["use_cases"]
+        keys = [key for key, _, _, _ in RESOURCE_SOURCES]
+        stale = [key for key in keys if stored.is_stale(key) or len(stored.get(key)) != len(cases)]
+        resources = [{key: stored.get(key)[index] for key in keys if key not in stale} for index in range(len(cases))]
+        span.tag(refreshed=','.join(stale) or None)
+
+        refreshed = {}
+        if stale:
+            queries = [f"{company_name} {case.get('heading', 'No heading')}" for case in cases]
+            fresh = find_resources(queries, timeout=deadline.budget("resources") if deadline else None, keys=stale)
+            refreshed = _report_parts(overview, cases, fresh)
+            del refreshed["analysis"]
+            for index, found in enumerate(resources):
+                for key in stale:
+                    # A failed refresh keeps showing the old results rather than none
+                    if key in refreshed:
+                        found[key] = refreshed[key][index]
+                    elif stored.get(key) is not None and len(stored.get(key)) == len(cases):
+                        found[key] = stored.get(key)[index]
+
+        formatted_use_cases = [_format_use_case(case, found, True) for case, found in zip(cases, resources)]
+        # The version of the report shown here: a PDF rendered from it later is only stored while it is current
+        version = max(updated for part, (_, updated) in stored.parts.items() if part != "pdf")
+        pdf_bytes = None if refreshed else stored.get("pdf")
+        if pdf_bytes is None and render_pdf:
+            pdf_bytes = create_pdf(company_name, overview, formatted_use_cases)
+            version = report_store.save_report(company_name, dict(refreshed, pdf=pdf_bytes), unchanged_since=version)
+        elif refreshed:
+            # The stored PDF shows the old resources; it is rendered again when someone asks for it
+            version = report_store.save_report(company_name, refreshed, remove=["pdf"], unchanged_since=version)
+    return overview, formatted_use_cases, pdf_bytes, stored.updated("analysis"), version
+
+def create_pdf(company_name, overview, use_cases):
+    """pdf_generator.create_pdf, imported on first use so fpdf isn't loaded until a PDF is needed."""
+    from pdf_generator import create_pdf as render
+    return render(company_name, overview, use_cases)
+
+def _deferred_pdf(company_name, overview, formatted_use_cases, pdf_bytes=None, version=None):
+    """
+    Wraps a report's PDF so it is only rendered on first use. With `version` (the time the report was
+    stored at), the rendered PDF is saved with it, unless the stored report has changed since.
+    """
+    from pdf_generator import DeferredPDF
+    save = None
+    if version is not None:
+        save = lambda rendered: report_store.save_report(company_name, {"pdf": rendered}, unchanged_since=version)
+    return DeferredPDF(company_name, overview, formatted_use_cases, pdf_bytes, on_render=save)
+
+def _generate_within_budget(company_name, company_info, deadline):
+    if deadline is None:
+        return generate_use_cases_with_gemini(company_name, company_info)
+    timeout = stage_timeout(deadline, "gemini", GEMINI_TIMEOUT)
     try:
-        response = requests.post(url, json=payload, timeout=90)
-        response.raise_for_status()
-        full_data = response.json()
-        json_str = full_data['candidates'][0]['content']['parts'][0]['text']
-        clean_json_str = json_str.strip().replace("```json", "").replace("```", "")
-        return json.loads(clean_json_str), None
-    except (requests.RequestException, json.JSONDecodeError, KeyError, IndexError) as e:
-        return {}, f"Error with Gemini API: {e}. Response: {response.text if 'response' in locals() else 'No API response'}"
+        return call_with_timeout(timeout, generate_use_cases_with_gemini, company_name, company_info, timeout=timeout)
+    except TimeoutError as e:
+        return {}, f"Gemini did not answer within the report deadline: {e}"
 
-def process_company_request(company_name):
+def process_company_request(company_name, deadline=DEFAULT_DEADLINE, use_store=True, render_pdf=True):
     """
     Main orchestrator function. It now returns the full data structure for UI display.
+    With `deadline` (seconds), the time is split across the stages: scraping is hedged,
+    and resource lookups that miss their budget are left out instead of blocking the report.
+    With `use_store`, a fresh stored report is served (see stored_report) instead of building a new one.
+    Without `render_pdf`, pdf_bytes may be None and the caller renders the PDF itself (e.g. batch.py).
     """
-    search_results, error = search_google(company_name)
-    if error: return None, None, None, None, error
-    if not search_results: return None, None, None, None, "Could not find any info for the company."
+    with tracing.span("report", company=company_name) as span:
+        result = _process_company_request(company_name, deadline, use_store, render_pdf)
+        span.tag(error=result[4])
+        return result
 
-    company_info = ""
-    for result in search_results:
-        content, error = parse_website(result['link'])
-        if content: company_info += content + " "
+def _process_company_request(company_name, deadline, use_store, render_pdf):
+    deadline = Deadline(deadline) if deadline else None
+    stored = stored_report(company_name, deadline, render_pdf) if use_store else None
+    if stored:
+        overview, formatted_use_cases, pdf_bytes, _, _ = stored
+        return overview, formatted_use_cases, pdf_bytes, _pdf_filename(company_name), None
 
-    if not company_info: return None, None, None, None, "Could not parse websites; they may block scrapers."
+    company_info, error = gather_company_info(company_name, deadline)
+    if error: return None, None, None, None, error
 
-    use_cases_data, error = generate_use_cases_with_gemini(company_name, company_info)
+    with tracing.span("stage", stage="gemini") as span:
+        use_cases_data, error = _generate_within_budget(company_name, company_info, deadline)
+        span.tag(error=error)
     if error: return None, None, None, None, error
     if not use_cases_data or 'use_cases' not in use_cases_data:
         return None, None, None, None, "AI model returned an unexpected format."
 
     overview = use_cases_data.get('overview', 'No overview generated.')
-    formatted_use_cases = []
-    for case in use_cases_data.get('use_cases', []):
-        heading = case.get('heading', 'No heading')
-        search_query = f"{company_name} {heading}"
-        formatted_use_cases.append({
-            "heading": heading,
-            "description": case.get('description', ''),
-            "implementation_steps": case.get('implementation_steps', []),
-            "datasets": find_kaggle_datasets(search_query),
-            "repos": find_github_repos(search_query),
-            "papers": find_arxiv_papers(search_query)
-        })
-
-    pdf_bytes = create_pdf(company_name, overview, formatted_use_cases)
-    pdf_filename = f"{company_name.replace(' ', '_')}_AI_ML_Report.pdf"
+    cases = use_cases_data.get('use_cases', [])
+    with tracing.span("stage", stage="resources"):
+        # All Kaggle/GitHub/ArXiv lookups run concurrently; results come back in heading order
+        resources = find_resources([f"{company_name} {case.get('heading', 'No heading')}" for case in cases],
+                                   timeout=deadline.budget("resources") if deadline else None)
+    formatted_use_cases = [_format_use_case(case, found, True) for case, found in zip(cases, resources)]
+
+    pdf_bytes = None
+    if render_pdf:
+        with tracing.span("stage", stage="pdf") as span:
+            pdf_bytes = create_pdf(company_name, overview, formatted_use_cases)
+            span.tag(bytes=len(pdf_bytes))
+    pdf_filename = _pdf_filename(company_name)
+    _save_report(company_name, overview, cases, resources, pdf_bytes)
     
     # Return all data for the UI
     return overview, formatted_use_cases, pdf_bytes, pdf_filename, None
 
+def stream_company_request(company_name, deadline=DEFAULT_DEADLINE, use_store=True, defer_pdf=False):
+    """
+    Progressive version of process_company_request for the UI. Yields events as the report builds up:
+      ("status", message)
+      ("overview", text)
+      ("use_case", (index, use_case))   -- text only, resources still empty
+      ("resources", (index, use_case))  -- the same use case with its datasets/repos/papers
+      ("done", {"overview", "use_cases", "pdf", "pdf_bytes", "pdf_filename", "trace_id"[, "stored_at"]})
+      ("error", message)
+    Per-query resource lookups for a use case start as soon as Gemini finishes writing it;
+    batched sources (e.g. ArXiv) run once all headings are known.
+    `deadline` and `use_store` work as in process_company_request; a stored report is
+    replayed as the same events, with "stored_at" (the analysis' timestamp) in the "done" payload.
+    "pdf" is a DeferredPDF; with `defer_pdf` it is only rendered when its render() is first
+    called (and "pdf_bytes" is None until then), otherwise it is rendered before "done".
+    """
+    deadline = Deadline(deadline) if deadline else None
+    # Spans are started/activated explicitly here: a `with` block must not stay open across a yield
+    report_span = tracing.start_span("report", company=company_name)
+    try:
+        yield from _stream_company_request(company_name, deadline, report_span, use_store, defer_pdf)
+    finally:
+        tracing.finish_span(report_span)
+
+def _stream_company_request(company_name, deadline, report_span, use_store, defer_pdf):
+    if use_store:
+        with tracing.activate(report_span):
+            stored = stored_report(company_name, deadline, render_pdf=not defer_pdf)
+        if stored:
+            overview, formatted_use_cases, pdf_bytes, stored_at, version = stored
+            yield "overview", overview
+            for index, case in enumerate(formatted_use_cases):
+                yield "use_case", (index, case)
+                yield "resources", (index, case)
+            yield "done", {
+                "overview": overview,
+                "use_cases": formatted_use_cases,
+                "pdf": _deferred_pdf(company_name, overview, formatted_use_cases, pdf_bytes, version),
+                "pdf_bytes": pdf_bytes,
+                "pdf_filename": _pdf_filename(company_name),
+                "trace_id": report_span.trace_id,
+                "stored_at": stored_at,
+            }
+            return
+
+    yield "status", "Searching the web and reading company pages..."
+    with tracing.activate(report_span):
+        company_info, error = gather_company_info(company_name, deadline)
+    if error:
+        report_span.tag(error=error)
+        yield "error", error
+        return
+
+    yield "status", "Generating use cases..."
+    batched = batched_keys()
+    streamed = [key for key, _, _, _ in RESOURCE_SOURCES if key not in batched]
+    overview = None
+    cases, lookups = [], []
+    use_cases_data = None
+    gemini_timeout = stage_timeout(deadline, "gemini", GEMINI_TIMEOUT)
+    gemini_span = tracing.start_span("stage", parent=report_span, stage="gemini")
+    events = stream_use_cases_with_gemini(company_name, company_info, timeout=gemini_timeout, deadline=deadline)
+    while True:
+        with tracing.activate(gemini_span):
+            kind, payload = next(events, (None, None))
+            if kind == "use_case":
+                cases.append(payload)
+                lookups.extend(submit_resource_lookups([f"{company_name} {payload.get('heading', 'No heading')}"], keys=streamed))
+        if kind is None:
+            break
+        if kind == "overview":
+            overview = payload
+            yield "overview", overview
+        elif kind == "use_case":
+            yield "use_case", (len(cases) - 1, _format_use_case(payload, {}))
+        elif kind == "complete":
+            use_cases_data = payload
+        elif kind == "error":
+            tracing.finish_span(gemini_span, error=payload)
+            report_span.tag(error=payload)
+            yield "error", payload
+            return
+    tracing.finish_span(gemini_span)
+
+    if not use_cases_data or 'use_cases' not in use_cases_data:
+        report_span.tag(error="unexpected format")
+        yield "error", "AI model returned an unexpected format."
+        return
+    if overview is None:
+        overview = use_cases_data.get('overview', 'No overview generated.')
+        yield "overview", overview
+
+    resources_span = tracing.start_span("stage", parent=report_span, stage="resources")
+    with tracing.activate(resources_span):
+        # Anything the incremental parser couldn't pick out mid-stream is taken from the final document
+        missed = use_cases_data['use_cases'][len(cases):]
+        for case in missed:
+            cases.append(case)
+            lookups.extend(submit_resource_lookups([f"{company_name} {case.get('heading', 'No heading')}"], keys=streamed))
+
+        queries = [f"{company_name} {case.get('heading', 'No heading')}" for case in cases]
+        for futures, batch_futures in zip(lookups, submit_resource_lookups(queries, keys=batched)):
+            futures.update(batch_futures)
+    for offset, case in enumerate(missed):
+        yield "use_case", (len(cases) - len(missed) + offset, _format_use_case(case, {}))
+
+    yield "status", "Finding datasets, repositories and papers..."
+    expires = time.monotonic() + deadline.budget("resources") if deadline else None
+    resources, formatted_use_cases = [], []
+    for index, (case, futures) in enumerate(zip(cases, lookups)):
+        resources.append(collect_resources(futures, expires))
+        formatted = _format_use_case(case, resources[-1], True)
+        formatted_use_cases.append(formatted)
+        yield "resources", (index, formatted)
+    tracing.finish_span(resources_span)
+
+    pdf_bytes = None
+    if not defer_pdf:
+        with tracing.activate(report_span), tracing.span("stage", stage="pdf") as span:
+            pdf_bytes = create_pdf(company_name, overview, formatted_use_cases)
+            span.tag(bytes=len(pdf_bytes))
+    # A report cut short by the deadline is shown, but not kept for the next user
+    version = None
+    if not use_cases_data.get("partial"):
+        version = _save_report(company_name, overview, cases, resources, pdf_bytes)
+    yield "done", {
+        "overview": overview,
+        "use_cases": formatted_use_cases,
+        "pdf": _deferred_pdf(company_name, overview, formatted_use_cases, pdf_bytes, version),
+        "pdf_bytes": pdf_bytes,
+        "pdf_filename": _pdf_filename(company_name),
+        "trace_id": report_span.trace_id,
+    }